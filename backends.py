@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+"""
+Picks the solver engine for solver.py and game_gui.py
+"""
+
+"""
+Backends:
+1. 'backtrack': the backtracking search over the bitmask state (bitmask.py), with
+    the constraint propagation from logic.py when strategy is 'logic'
+2. 'dlx': Knuth's Dancing Links exact cover search (dlx.py), also works for 16x16
+    and bigger boards
+3. 'iterative': the same search as 1 without recursion (iterative.py), for strategy
+    'logic', 'reading' or 'mrv' (those two guess without any logic, only fit for 9x9)
+
+Both fill the board in place and return whether a solution was found.
+"""
+
+import bitmask
+import dlx
+import iterative
+import logic
+
+BACKENDS = ('backtrack', 'dlx', 'iterative')
+
+
+def solve(board, backend='backtrack', strategy='logic', lcv=False, stats=None):
+    """
+    Solves a sudoku board in place with the chosen engine
+    input: board: 2d list of ints with 0 for the empty squares
+    input: backend: one of BACKENDS
+    input: strategy, lcv: how 'backtrack' picks squares and numbers (see solver.solve), 'iterative'
+        takes the strategy but not lcv (see iterative.py)
+    input: stats: instrument.Stats to count the search in, or None (see instrument.py)
+    output: bool for whether a solution was found
+    """
+    if backend == 'dlx':
+        return dlx.run(board, stats).solved
+    if backend == 'iterative':
+        return iterative.run(board, strategy, stats).solved
+    if backend != 'backtrack':
+        raise ValueError("Unknown backend '{}', expected one of {}".format(backend, BACKENDS))
+
+    if strategy == 'logic':
+        return logic.run(board, stats).solved
+
+    return bitmask.run(board, strategy, lcv, stats).solved
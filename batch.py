@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+"""
+Batch solving for files of sudoku puzzles
+"""
+
+"""
+The input is the common one puzzle per line format: 81 characters read like a book,
+with '0' or '.' for the empty squares. Bigger boards work the same way, 256 characters
+for 16x16 and 625 for 25x25, with the letters A-P for 10-25. Blank lines and lines
+starting with '#' are skipped. Each step below is a generator, so only one puzzle is in memory at a time
+no matter how big the file is:
+
+1. read_puzzles turns lines into boards
+2. solve_puzzles solves each board in place
+3. format_board turns each board back into an 81 character line
+"""
+
+from collections import deque
+from math import isqrt
+
+import backends
+import instrument
+from board import SYMBOLS, Board, box_size
+
+EMPTY = 0
+SIZE = 9
+BLANKS = '0.'
+
+
+def text_table():
+    """
+    output: bytes translate table giving the value of every character (either case for
+        the letters), 255 for the ones that can't be in a puzzle
+    """
+    table = bytearray(b'\xff' * 256)
+    for value, char in enumerate(SYMBOLS):
+        table[ord(char)] = table[ord(char.lower())] = value
+    for char in BLANKS:
+        table[ord(char)] = EMPTY
+    return bytes(table)
+
+
+# So a whole line is turned into a board by one translate
+FROM_TEXT = text_table()
+
+
+def parse_line(line):
+    """
+    input: line: string of 81 digits with '0' or '.' for the empty squares (or 256 / 625
+        characters for a 16x16 / 25x25 board, A-P for 10-25)
+    output: Board
+    """
+    size = isqrt(len(line))
+    try:
+        if size * size != len(line):
+            raise ValueError
+        box_size(size)
+    except ValueError:
+        raise ValueError("Expected {} characters (or 256, 625, ...), got {}".format(
+            SIZE * SIZE, len(line))) from None
+
+    cells = line.encode('ascii', 'replace').translate(FROM_TEXT)
+    if max(cells) > size:
+        bad = next(k for k, value in enumerate(cells) if value > size)
+        raise ValueError("Unexpected character '{}'".format(line[bad]))
+
+    return Board(cells, size)
+
+
+def format_board(board):
+    """
+    input: board: Board or 2d list of ints
+    output: string of 81 digits with '0' for the empty squares (longer, with letters, for bigger boards)
+    """
+    if isinstance(board, Board):
+        return str(board)
+
+    return ''.join(SYMBOLS[value] for row in board for value in row)
+
+
+def numbered(lines):
+    """
+    Numbers lines from 1 like enumerate, turning a file that isn't text into a ValueError
+    input: lines: iterable of strings (an open file works)
+    output: generator of (int line number, string) tuples
+    """
+    number = 0
+    lines = iter(lines)
+    while True:
+        try:
+            line = next(lines)
+        except StopIteration:
+            return
+        except UnicodeDecodeError as error:
+            raise ValueError("Line {}: not text ({})".format(number + 1, error.reason)) from None
+        number += 1
+        yield number, line
+
+
+def read_puzzles(lines):
+    """
+    input: lines: iterable of strings (an open file works)
+    output: generator of boards, one per puzzle line
+    """
+    for number, line in numbered(lines):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        try:
+            yield parse_line(line)
+        except ValueError as error:
+            raise ValueError("Line {}: {}".format(number, error)) from None
+
+
+def solve_puzzles(boards, backend='backtrack', cache=None, timeout=None, max_nodes=None):
+    """
+    input: boards: iterable of boards
+    input: backend: solver engine (see backends.py)
+    input: cache: SolutionCache (see cache.py) to look boards up in first, or None
+    input: timeout: float seconds to spend on each board before giving up on it, or None
+    input: max_nodes: int guesses to spend on each board before giving up on it, or None
+        (with a cache only the misses are solved, and limited)
+    output: generator of (board, bool solved) tuples, solved boards are filled in
+    """
+    for board in boards:
+        if cache is not None:
+            yield board, cache.solve(board, timeout, max_nodes)
+        elif timeout is not None or max_nodes is not None:
+            yield board, instrument.profile(board, backend, timeout=timeout, max_nodes=max_nodes).solved
+        else:
+            yield board, backends.solve(board, backend)
+
+
+def solve_file(input_file, output_file, backend='backtrack', workers=1, vectorized=False, cache=None, timeout=None,
+               max_nodes=None, input_format='line', output_format='line'):
+    """
+    Solves every puzzle in input_file and writes one line per puzzle to output_file.
+    Puzzles without a solution (or given up on) are written back unchanged.
+    input: input_file, output_file: open files (binary for the 'packed' format, text otherwise)
+    input: backend: solver engine (see backends.py)
+    input: workers: int number of processes, more than 1 solves in parallel (see parallel.py)
+        but still writes the lines in input order
+    input: vectorized: bool, True runs the singles for many puzzles at once with numpy
+        (see vectorized.py, needs numpy installed)
+    input: cache: SolutionCache to solve through when running in this process, or None
+    input: timeout, max_nodes: limits per puzzle, same as solve_puzzles (with vectorized they only
+        limit the search of the puzzles the singles can't finish)
+    input: input_format, output_format: one of formats.FORMATS, JSON Lines to JSON Lines
+        keeps each puzzle's other fields
+    output: tuple of ints (puzzles read, puzzles solved)
+    """
+    # The other fields of JSON Lines records, waiting for their puzzle's result
+    fields = deque()
+    if input_format == 'line' and output_format == 'line':
+        boards = read_puzzles(input_file)
+    else:
+        # The other formats are only needed when asked for
+        import formats
+        if input_format == 'jsonl' and output_format == 'jsonl':
+            boards = set_aside(formats.read_records(input_file), fields)
+        else:
+            boards = formats.read_puzzles(input_file, input_format)
+
+    if vectorized:
+        # numpy is only needed here, so import it only when asked for
+        import vectorized as numpy_solver
+        results = numpy_solver.solve_stream(boards, backend=backend, timeout=timeout, max_nodes=max_nodes)
+    elif workers > 1:
+        # Same for the process pool, so a single process run doesn't pay for it
+        import parallel
+        results = parallel.solve_many(boards, workers, backend=backend, timeout=timeout,
+                                      max_nodes=max_nodes)
+    else:
+        results = solve_puzzles(boards, backend, cache, timeout, max_nodes)
+
+    counts = [0, 0]
+    if output_format == 'line':
+        for board, found in results:
+            output_file.write(format_board(board) + '\n')
+            counts[0] += 1
+            counts[1] += found
+    elif output_format == 'jsonl':
+        # Every engine gives the results back in input order
+        formats.write_records(output_file, ((board, fields.popleft() if fields else None)
+                                            for board in counted(results, counts)))
+    else:
+        formats.write_puzzles(output_file, counted(results, counts), output_format)
+
+    return tuple(counts)
+
+
+def set_aside(records, fields):
+    """
+    input: records: iterable of (board, dict of other fields) tuples
+    input: fields: deque to append each record's fields to
+    output: generator of the boards
+    """
+    for board, other in records:
+        fields.append(other)
+        yield board
+
+
+def counted(results, counts):
+    """
+    input: results: iterable of (board, bool solved) tuples
+    input: counts: list [puzzles, solved] to add each result to
+    output: generator of the boards
+    """
+    for board, found in results:
+        counts[0] += 1
+        counts[1] += found
+        yield board
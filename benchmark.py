@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks for the solver engines over the puzzle files in corpora/
+"""
+
+"""
+Every engine solves every puzzle of every corpus (a copy each time, so every run
+starts from the same board) once to warm up, then --repeat more times timed one
+puzzle at a time. Each puzzle keeps its best time, which leaves out most of the
+noise from the rest of the machine:
+
+    puzzles_per_second  puzzles solved divided by the total of the best times
+    p50/p95/p99         best latency of a single puzzle in milliseconds
+    nodes               search nodes (guesses) over the corpus, same every run
+    peak_memory         most bytes allocated at once, measured in a second pass
+                        with tracemalloc so its overhead stays out of the timings
+
+Results are written as JSON and can be checked against an older results file.
+More nodes or fewer puzzles solved is a regression and the script exits with 1,
+those are the same on every machine. A rate or latency more than --threshold
+worse is only printed as a warning, timings move with the machine and its load.
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json --threshold 0.2
+
+The 'reading' engine is left out by default: the adversarial corpus takes it minutes.
+'iterative-logic' and 'iterative-mrv' run iterative.py's search with each strategy.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import bitmask
+import dlx
+import iterative
+import logic
+from batch import read_puzzles
+from board import copy_board
+
+# The corpora that ship next to this file
+CORPORA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora')
+
+# Engine name -> function solving a board in place and returning its state (with solved and nodes)
+ENGINES = {
+    'reading': lambda board: bitmask.run(board, 'reading'),
+    'mrv': lambda board: bitmask.run(board, 'mrv'),
+    'mrv+lcv': lambda board: bitmask.run(board, 'mrv', True),
+    'logic': logic.run,
+    'dlx': dlx.run,
+    'iterative-logic': lambda board: iterative.run(board, 'logic'),
+    'iterative-mrv': lambda board: iterative.run(board, 'mrv'),
+}
+DEFAULT_ENGINES = ('mrv', 'logic', 'dlx')
+
+# How much worse than the baseline counts as a regression (0.2 = 20%)
+THRESHOLD = 0.2
+
+# Timed rounds over each corpus, after the warm up
+REPEAT = 3
+
+
+def load_corpora(path=CORPORA_PATH, names=None):
+    """
+    input: path: string directory of .txt puzzle files (see batch.read_puzzles)
+    input: names: list of corpus names (file names without .txt), or None for all
+    output: dict of corpus name to list of Boards
+    """
+    if names is None:
+        names = sorted(name[:-4] for name in os.listdir(path) if name.endswith('.txt'))
+
+    corpora = {}
+    for name in names:
+        with open(os.path.join(path, name + '.txt')) as file:
+            corpora[name] = list(read_puzzles(file))
+
+    return corpora
+
+
+def percentile(values, fraction):
+    """
+    input: values: sorted list of numbers
+    input: fraction: float from 0 to 1
+    output: the nearest rank percentile of values
+    """
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * fraction // 1))
+    return values[int(rank) - 1]
+
+
+def peak_memory(engine, boards):
+    """
+    input: engine: function from ENGINES
+    input: boards: list of boards, not changed
+    output: int most bytes traced at once while solving them one after another
+    """
+    tracemalloc.start()
+    try:
+        for board in boards:
+            engine(copy_board(board))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(engine, boards, repeat=REPEAT):
+    """
+    Times an engine over a corpus
+    input: engine: function from ENGINES
+    input: boards: list of boards, not changed
+    input: repeat: int timed rounds over the corpus after the warm up (each puzzle keeps its best time)
+    output: dict of the numbers described at the top of the file
+    """
+    # Warm up round, untimed, which also counts the nodes (the same every round)
+    nodes = solved = 0
+    for board in boards:
+        state = engine(copy_board(board))
+        nodes += state.nodes
+        solved += state.solved
+
+    latencies = [float('inf')] * len(boards)
+    for _ in range(max(1, repeat)):
+        for k, board in enumerate(boards):
+            board = copy_board(board)
+            start = time.perf_counter()
+            engine(board)
+            latencies[k] = min(latencies[k], time.perf_counter() - start)
+
+    total = sum(latencies)
+    latencies.sort()
+    return {
+        'puzzles': len(boards),
+        'solved': solved,
+        'puzzles_per_second': len(latencies) / total if total > 0 else float('inf'),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'nodes': nodes,
+        'peak_memory': peak_memory(engine, boards),
+    }
+
+
+def run(engines=DEFAULT_ENGINES, corpora=None, repeat=REPEAT):
+    """
+    input: engines: names from ENGINES
+    input: corpora: dict of corpus name to list of boards (default: everything in corpora/)
+    input: repeat: int, same as measure
+    output: dict ready for JSON, results under ['results'][engine][corpus]
+    """
+    corpora = load_corpora() if corpora is None else corpora
+    for name in engines:
+        if name not in ENGINES:
+            raise ValueError("Unknown engine '{}', expected one of {}".format(name, tuple(ENGINES)))
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': {name: {corpus: measure(ENGINES[name], boards, repeat) for corpus, boards in corpora.items()}
+                    for name in engines},
+    }
+
+
+def compared(report, baseline):
+    """
+    input: report, baseline: dicts from run()
+    output: generator of (engine, corpus, result, old result) for the engines and corpora in both
+    """
+    for name, corpora in report['results'].items():
+        for corpus, result in corpora.items():
+            old = baseline.get('results', {}).get(name, {}).get(corpus)
+            if old is not None:
+                yield name, corpus, result, old
+
+
+def regressions(report, baseline, threshold=THRESHOLD):
+    """
+    Compares the node counts and puzzles solved of a report from run() with an older one
+    input: report, baseline: dicts from run()
+    input: threshold: float, how many more nodes are allowed (0.2 = 20%)
+    output: list of strings, one per regression (empty if there are none)
+    """
+    found = []
+    for name, corpus, result, old in compared(report, baseline):
+        if result['nodes'] > old['nodes'] * (1 + threshold):
+            found.append('{} {}: nodes {}, was {}'.format(name, corpus, result['nodes'], old['nodes']))
+        if result['solved'] < old['solved']:
+            found.append('{} {}: solved {}, was {}'.format(name, corpus, result['solved'], old['solved']))
+
+    return found
+
+
+def slowdowns(report, baseline, threshold=THRESHOLD):
+    """
+    Same as regressions for the rate and latencies, which are only warned about
+    """
+    found = []
+    for name, corpus, result, old in compared(report, baseline):
+        if result['puzzles_per_second'] < old['puzzles_per_second'] * (1 - threshold):
+            found.append('{} {}: {:.1f} puzzles/s, was {:.1f}'.format(
+                name, corpus, result['puzzles_per_second'], old['puzzles_per_second']))
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if result[key] > old[key] * (1 + threshold):
+                found.append('{} {}: {} {:.2f}, was {:.2f}'.format(name, corpus, key, result[key], old[key]))
+
+    return found
+
+
+def print_report(report):
+    print('{:<15} {:<12} {:>7} {:>10} {:>9} {:>9} {:>9} {:>9} {:>10}'.format(
+        'engine', 'corpus', 'solved', 'puzzles/s', 'p50 ms', 'p95 ms', 'p99 ms', 'nodes', 'peak KiB'))
+    for name, corpora in report['results'].items():
+        for corpus, result in corpora.items():
+            print('{:<15} {:<12} {:>7} {:>10.1f} {:>9.2f} {:>9.2f} {:>9.2f} {:>9} {:>10.1f}'.format(
+                name, corpus, '{}/{}'.format(result['solved'], result['puzzles']), result['puzzles_per_second'],
+                result['p50_ms'], result['p95_ms'], result['p99_ms'], result['nodes'], result['peak_memory'] / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the solver engines over the puzzle corpora')
+    parser.add_argument('--engines', nargs='+', choices=tuple(ENGINES), default=list(DEFAULT_ENGINES),
+                        help='engines to run (default: {})'.format(' '.join(DEFAULT_ENGINES)))
+    parser.add_argument('--corpora', nargs='+', metavar='NAME',
+                        help='corpora to run, file names in corpora/ without .txt (default: all)')
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help='timed rounds over each corpus, each puzzle keeps its best time (default: {})'.format(
+                            REPEAT))
+    parser.add_argument('--output', metavar='FILE', help='write the results as JSON here')
+    parser.add_argument('--baseline', metavar='FILE', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='fraction worse than the baseline that is reported (default: 0.2)')
+    args = parser.parse_args()
+
+    report = run(args.engines, load_corpora(names=args.corpora), args.repeat)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        for line in slowdowns(report, baseline, args.threshold):
+            print('Slower: ' + line, file=sys.stderr)
+        found = regressions(report, baseline, args.threshold)
+        for line in found:
+            print('Regression: ' + line, file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+
+"""
+Bitmask constraint state for the backtracking solver
+"""
+
+"""
+Instead of scanning the row, column and box of the board for every guess, the
+solver keeps one int per row, column and box. Bit d of a mask is set when the
+digit d is already used in that unit, so:
+
+1. Placing a digit is three ORs and removing it is three XORs.
+2. The digits still allowed in a square are the bits left over after OR-ing its
+    row, column and box masks together and inverting against all the digits.
+3. Looping over the candidates is just peeling off the lowest set bit.
+
+The board itself is still the same 2d list, and it is filled in place exactly
+like the original solve does.
+
+Bigger N^2 x N^2 boards (16x16, 25x25) work the same way with one bit per digit
+(Python ints have as many bits as needed). The tables for each board size are made
+once by layout() and shared by every board of that size.
+"""
+
+from functools import lru_cache
+
+from board import box_size, copy_board
+
+EMPTY = 0
+SIZE = 9
+BOX = 3
+
+STRATEGIES = ('reading', 'mrv')
+
+
+class Layout:
+    """
+    The fixed tables for one board size
+    """
+    def __init__(self, size):
+        box = box_size(size)
+        self.size = size
+        self.box = box
+
+        # Bits 1-size set, one per digit (bit 0 is unused so digit d is simply 1 << d)
+        self.all_digits = sum(1 << d for d in range(1, size + 1))
+
+        # Squares are numbered 0 to size * size - 1 like reading a book (the index into
+        # Board.cells). Everything below is worked out once here, so no solver has to
+        # do any row/column/box arithmetic while it runs.
+        cells = range(size * size)
+        self.positions = tuple(divmod(k, size) for k in cells)
+        self.box_index = tuple((i // box) * box + j // box for i, j in self.positions)
+
+        # The units as tuples of squares: rows, then columns, then boxes
+        self.unit_cells = (tuple(tuple(i * size + j for j in range(size)) for i in range(size))
+                           + tuple(tuple(i * size + j for i in range(size)) for j in range(size))
+                           + tuple(tuple(k for k in cells if self.box_index[k] == b) for b in range(size)))
+
+        # The 3 units (row, column, box) and the other squares sharing one of them, for each square
+        self.units_of = tuple((self.unit_cells[i], self.unit_cells[size + j], self.unit_cells[2 * size + b])
+                              for (i, j), b in zip(self.positions, self.box_index))
+        self.peers_of = tuple(tuple(sorted(set().union(*units) - {k})) for k, units in enumerate(self.units_of))
+
+        # The same tables with (row, column) tuples, for code working on 2d boards
+        self.box_of = [list(self.box_index[i * size:(i + 1) * size]) for i in range(size)]
+        self.units = [[self.positions[k] for k in unit] for unit in self.unit_cells]
+        self.rows = self.units[:size]
+        self.columns = self.units[size:2 * size]
+        self.boxes = self.units[2 * size:]
+
+
+@lru_cache(maxsize=None)
+def layout(size):
+    """
+    input: size: int rows of the board (9, 16, 25, ...)
+    output: Layout, made once per size
+    """
+    return Layout(size)
+
+
+class BitBoard:
+    """
+    Wraps a 2d list board (any N^2 x N^2 size) with per row, column and box masks of the digits used.
+    The wrapped board is modified in place by place and remove.
+    """
+    # Stats collected while solving, only set on the traced boards from instrument.py
+    stats = None
+
+    def __init__(self, board):
+        self.board = board
+        self.size = size = len(board)
+        self.layout = layout(size)
+        self.all_digits = self.layout.all_digits
+        self.box_of = self.layout.box_of
+        self.positions = self.layout.positions
+        self.peers_of = self.layout.peers_of
+        self.rows = [0] * size
+        self.columns = [0] * size
+        self.boxes = [0] * size
+
+        # False if the starting board already breaks a rule
+        self.consistent = True
+
+        # Digits placed by the search, i.e. nodes in the search tree
+        self.nodes = 0
+        self.solved = False
+
+        for i in range(size):
+            for j in range(size):
+                number = board[i][j]
+                if number != EMPTY:
+                    if not self.valid_number(number, (i, j)):
+                        self.consistent = False
+                    self.place(number, (i, j))
+
+    def candidates(self, position):
+        """
+        Gets the digits that can still go in a square
+        input: position: tuple for spot in grid (row, column)
+        output: int mask with bit d set for each allowed digit d
+        """
+        row, column = position
+        used = self.rows[row] | self.columns[column] | self.boxes[self.box_of[row][column]]
+        return self.all_digits & ~used
+
+    def valid_number(self, number, position):
+        """
+        Returns if the attempted move is valid
+        input: number: int of guess
+        input: position: tuple for spot in grid (row, column)
+        output: bool
+        """
+        return bool(self.candidates(position) & (1 << number))
+
+    def place(self, number, position):
+        """
+        Puts a digit on the board and marks it used in its row, column and box
+        input: number: int to place
+        input: position: tuple for spot in grid (row, column)
+        """
+        row, column = position
+        bit = 1 << number
+        self.rows[row] |= bit
+        self.columns[column] |= bit
+        self.boxes[self.box_of[row][column]] |= bit
+        self.board[row][column] = number
+
+    def remove(self, number, position):
+        """
+        Undoes place, emptying the square and freeing the digit again
+        input: number: int that was placed
+        input: position: tuple for spot in grid (row, column)
+        """
+        row, column = position
+        bit = 1 << number
+        self.rows[row] ^= bit
+        self.columns[column] ^= bit
+        self.boxes[self.box_of[row][column]] ^= bit
+        self.board[row][column] = EMPTY
+
+    def guess(self, number, position):
+        """
+        Same as place, for a digit the search is trying out (a node in the search tree)
+        input: number: int to place
+        input: position: tuple for spot in grid (row, column)
+        """
+        row, column = position
+        bit = 1 << number
+        self.rows[row] |= bit
+        self.columns[column] |= bit
+        self.boxes[self.box_of[row][column]] |= bit
+        self.board[row][column] = number
+        self.nodes += 1
+
+    # Taking a guess back is the same as any other remove
+    backtrack = remove
+
+    def peers(self, position):
+        """
+        input: position: tuple for spot in grid (row, column)
+        output: iterator of (row, column) tuples for the other squares in its row, column and box
+        """
+        positions = self.positions
+        return (positions[p] for p in self.peers_of[position[0] * self.size + position[1]])
+
+    def degree(self, position):
+        """
+        input: position: tuple for spot in grid (row, column)
+        output: int number of empty squares that share a unit with this one
+        """
+        board = self.board
+        return sum(1 for i, j in self.peers(position) if board[i][j] == EMPTY)
+
+    def least_constraining(self, free, position):
+        """
+        Orders digits by how many empty peers would lose them as an option, fewest first
+        input: free: int mask of the digits to order
+        input: position: tuple for spot in grid (row, column)
+        output: list of ints
+        """
+        board = self.board
+        masks = [self.candidates((i, j)) for i, j in self.peers(position) if board[i][j] == EMPTY]
+        return sorted(digits(free), key=lambda number: sum(1 for mask in masks if mask & (1 << number)))
+
+    def empties(self):
+        """
+        output: list of (row, column) tuples for every empty square, in reading order
+        """
+        size = self.size
+        return [(i, j) for i in range(size) for j in range(size) if self.board[i][j] == EMPTY]
+
+
+def solve(board, strategy='reading', lcv=False):
+    """
+    Solves a sudoku board in place using backtracking over the bitmask state
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares
+    input: strategy: 'reading' to fill squares L->R, Top->Bot or 'mrv' to always fill
+        the square with the fewest candidates left
+    input: lcv: bool, with 'mrv' try the digits that rule out the fewest options first
+    output: bool for whether a solution was found
+    """
+    return run(board, strategy, lcv).solved
+
+
+def run(board, strategy='reading', lcv=False, stats=None):
+    """
+    Solves a sudoku board in place and keeps the state for inspection
+    input: board, strategy, lcv: same as solve
+    input: stats: instrument.Stats to count the search in, or None to run untraced
+    output: BitBoard used for the search (see its solved and nodes)
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError("Unknown strategy '{}', expected one of {}".format(strategy, STRATEGIES))
+
+    state = new_state(board, stats)
+    if not state.consistent:
+        return state
+
+    if strategy == 'mrv':
+        state.solved = search_mrv(state, state.empties(), 0, lcv)
+    else:
+        state.solved = search(state, state.empties(), 0)
+
+    return state
+
+
+def new_state(board, stats=None):
+    """
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares
+    input: stats: instrument.Stats, or None
+    output: BitBoard, or a traced one reporting to stats
+    """
+    if stats is None:
+        return BitBoard(board)
+
+    # Only needed when tracing (instrument.py imports this file)
+    from instrument import TracedBitBoard
+    return TracedBitBoard(board, stats)
+
+
+def compare_strategies(board):
+    """
+    Counts the search nodes each strategy needs for the same board (the board is not changed)
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares
+    output: dict of strategy name to int nodes
+    """
+    counts = {}
+    for name, strategy, lcv in (('reading', 'reading', False), ('mrv', 'mrv', False), ('mrv+lcv', 'mrv', True)):
+        counts[name] = run(copy_board(board), strategy, lcv).nodes
+
+    return counts
+
+
+def search(state, empties, index):
+    """
+    Fills the empty squares from index onward, trying digits lowest first
+    input: state: BitBoard for the board being solved
+    input: empties: list of (row, column) tuples still to fill
+    input: index: int of the next square in empties to fill
+    output: bool for whether the rest of the board could be filled
+    """
+    if index == len(empties):
+        return True
+
+    position = empties[index]
+    free = state.candidates(position)
+
+    while free:
+        bit = free & -free
+        free ^= bit
+        number = bit.bit_length() - 1
+
+        state.guess(number, position)
+
+        # Recursive check
+        if search(state, empties, index + 1):
+            return True
+
+        state.backtrack(number, position)
+
+    return False
+
+
+def search_mrv(state, empties, index, lcv=False):
+    """
+    Like search, but picks the most constrained square of empties[index:] each step
+    and swaps it into empties[index] before branching on it.
+    Ties on the number of candidates go to the square with the most empty peers.
+    input: state, empties, index: same as search
+    input: lcv: bool for least constraining value ordering of the digits
+    output: bool for whether the rest of the board could be filled
+    """
+    if index == len(empties):
+        return True
+
+    best = index
+    best_count = state.size + 1
+    best_degree = -1
+    for k in range(index, len(empties)):
+        count = state.candidates(empties[k]).bit_count()
+        if count > best_count:
+            continue
+        if count <= 1:
+            best = k
+            break
+
+        degree = state.degree(empties[k])
+        if count < best_count or degree > best_degree:
+            best, best_count, best_degree = k, count, degree
+
+    empties[index], empties[best] = empties[best], empties[index]
+    position = empties[index]
+    free = state.candidates(position)
+
+    if lcv:
+        numbers = state.least_constraining(free, position)
+    else:
+        numbers = digits(free)
+
+    found = False
+    for number in numbers:
+        state.guess(number, position)
+
+        # Recursive check
+        if search_mrv(state, empties, index + 1, lcv):
+            found = True
+            break
+
+        state.backtrack(number, position)
+
+    empties[index], empties[best] = empties[best], empties[index]
+    return found
+
+
+def digits(mask):
+    """
+    input: mask: int with bit d set for each digit d
+    output: list of the digits in the mask, lowest first
+    """
+    numbers = []
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        numbers.append(bit.bit_length() - 1)
+
+    return numbers
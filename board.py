@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+"""
+Compact sudoku board stored as one flat bytearray
+"""
+
+"""
+A 2d list board is 10 list objects and 81 pointers to int objects. Board keeps the
+same 81 numbers in a single 81 byte bytearray read like a book, so:
+
+1. copy() is one memcpy of 81 bytes
+2. board[i] is a memoryview of row i (no copying), so board[i][j] reads and writes
+    exactly like the 2d lists and every solver function can take a Board as is
+3. column(j) and box(b) are views into the same bytes as well
+4. boards can be hashed and compared by value, e.g. to use them as dict keys
+    (don't change a board while it is a key)
+
+Any N^2 x N^2 board works the same way (16x16 with 4x4 boxes, 25x25 with 5x5 boxes,
+...), the size is worked out from the number of cells. As text, values above 9 are
+written as letters: A is 10, B is 11, ... up to P for 25.
+"""
+
+from math import isqrt
+
+EMPTY = 0
+SIZE = 9
+BOX = 3
+
+# Text symbol of each value, '0' for empty
+SYMBOLS = '0123456789ABCDEFGHIJKLMNOP'
+MAX_SIZE = len(SYMBOLS) - 1
+TO_TEXT = bytes.maketrans(bytes(range(len(SYMBOLS))), SYMBOLS.encode('ascii'))
+
+
+def box_size(size):
+    """
+    input: size: int number of rows (and columns) of a board
+    output: int number of rows (and columns) of one box
+    """
+    box = isqrt(size)
+    if size < 1 or box * box != size or size > MAX_SIZE:
+        raise ValueError("Board size must be a square number up to {}, got {}".format(MAX_SIZE, size))
+    return box
+
+
+class Board:
+    """
+    N^2 x N^2 sudoku board (9x9 unless made bigger) backed by a flat bytearray of cell
+    values (0 for empty)
+    """
+    __slots__ = ('cells', 'size')
+
+    def __init__(self, values=None, size=None):
+        """
+        input: values: 2d list of ints, flat iterable of size * size ints, bytes, another Board,
+            or None for an empty board
+        input: size: int number of rows, or None to work it out from values (9 for an empty board)
+        """
+        if values is None:
+            self.cells = bytearray((size or SIZE) ** 2)
+        elif isinstance(values, Board):
+            self.cells = bytearray(values.cells)
+        elif isinstance(values, (bytes, bytearray)):
+            self.cells = bytearray(values)
+        else:
+            values = list(values)
+            if values and not isinstance(values[0], int):
+                values = [value for row in values for value in row]
+            self.cells = bytearray(values)
+
+        self.size = size or isqrt(len(self.cells))
+        if len(self.cells) != self.size * self.size:
+            raise ValueError("Board needs {} cells, got {}".format(self.size * self.size, len(self.cells)))
+        box_size(self.size)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        """
+        output: memoryview of the row, board[i][j] = x writes straight into the board
+        """
+        size = self.size
+        if not 0 <= row < size:
+            raise IndexError("row index out of range")
+        return memoryview(self.cells)[row * size:(row + 1) * size]
+
+    def __iter__(self):
+        size = self.size
+        view = memoryview(self.cells)
+        for row in range(size):
+            yield view[row * size:(row + 1) * size]
+
+    def __eq__(self, other):
+        if isinstance(other, Board):
+            return self.cells == other.cells
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(bytes(self.cells))
+
+    def __repr__(self):
+        return 'Board({!r})'.format(str(self))
+
+    def __str__(self):
+        return self.cells.translate(TO_TEXT).decode('ascii')
+
+    def __getstate__(self):
+        return bytes(self.cells)
+
+    def __setstate__(self, state):
+        self.cells = bytearray(state)
+        self.size = isqrt(len(self.cells))
+
+    def column(self, column):
+        """
+        output: memoryview of the column (strided, no copying)
+        """
+        return memoryview(self.cells)[column::self.size]
+
+    def box(self, box):
+        """
+        input: box: int numbered like reading a book (0-8 on a 9x9 board)
+        output: list of memoryviews, the box's part of each of its rows
+        """
+        size = self.size
+        side = box_size(size)
+        top = (box // side) * side
+        left = (box % side) * side
+        view = memoryview(self.cells)
+        return [view[(top + k) * size + left:(top + k) * size + left + side] for k in range(side)]
+
+    def copy(self):
+        """
+        output: new Board with the same values
+        """
+        return Board(self.cells, self.size)
+
+    def tolist(self):
+        """
+        output: 2d list of ints
+        """
+        size = self.size
+        return [list(self.cells[row * size:(row + 1) * size]) for row in range(size)]
+
+
+def copy_board(board):
+    """
+    Copies a Board or a 2d list board
+    input: board: Board or 2d list of ints
+    output: board of the same kind that shares nothing with the original
+    """
+    if isinstance(board, Board):
+        return board.copy()
+
+    return [list(row) for row in board]
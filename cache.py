@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+"""
+Solution cache keyed by a canonical form of the puzzle
+"""
+
+"""
+Lots of puzzles are the same puzzle in disguise. These changes never change whether
+(or how) a puzzle can be solved:
+
+1. relabelling the digits (swap every 1 with every 7, ...)
+2. reordering the rows inside a band of 3 rows, or the columns inside a stack
+3. reordering the bands, or the stacks
+4. transposing (rows become columns)
+
+canonical() turns a puzzle into a standard form under all of these: it tries the
+row and column orders that sort the rows, columns, bands and stacks by how their
+clues are spread out (only orders that keep ties in any order are tried), relabels
+digits in the order they first show up, and keeps the smallest result. The same
+puzzle in any disguise gives the same key (apart from very symmetric boards where
+there are too many ties to try them all, which then just miss the cache).
+
+The solution is stored in the canonical form too, and mapped back through the
+puzzle's own row/column order and digit labels on a hit. Entries are evicted least
+recently used first, and the cache can be saved to and loaded from a text file.
+"""
+
+import os
+from collections import OrderedDict
+from itertools import permutations, product
+
+import backends
+import instrument
+
+EMPTY = 0
+SIZE = 9
+BOX = 3
+
+# Stop trying more tie orders after this many row/column order pairs (per orientation)
+MAX_ORDERS = 4096
+
+
+class Transform:
+    """
+    How a puzzle maps onto its canonical form: canonical square (r, c) is the
+    original square (rows[r], columns[c]), or (columns[c], rows[r]) if transposed,
+    and original digit d is canonical digit labels[d].
+    """
+    def __init__(self, transposed, rows, columns, labels):
+        self.transposed = transposed
+        self.rows = rows
+        self.columns = columns
+        self.labels = labels
+
+    def source(self, r, c):
+        """
+        output: (row, column) of the original square behind canonical square (r, c)
+        """
+        if self.transposed:
+            return self.columns[c], self.rows[r]
+        return self.rows[r], self.columns[c]
+
+
+def cells_of(board):
+    """
+    input: board: 2d list of ints or Board
+    output: flat list of 81 ints read like a book
+    """
+    return [board[i][j] for i in range(SIZE) for j in range(SIZE)]
+
+
+def ranks(values):
+    """
+    Replaces each value by its position among the sorted distinct values
+    """
+    order = {value: rank for rank, value in enumerate(sorted(set(values)))}
+    return [order[value] for value in values]
+
+
+def line_colors(cells):
+    """
+    Gives every row and column a label that does not depend on the order of the other
+    rows/columns or on the digits, by repeatedly mixing in the labels of the lines
+    their clues sit on
+    input: cells: flat list of 81 ints
+    output: tuple (list of 9 row labels, list of 9 column labels)
+    """
+    clue = [[cells[i * SIZE + j] != EMPTY for j in range(SIZE)] for i in range(SIZE)]
+
+    # Start with the clue counts in each third of the line
+    rows = ranks([tuple(sorted(sum(clue[i][s * BOX + k] for k in range(BOX)) for s in range(BOX)))
+                  for i in range(SIZE)])
+    columns = ranks([tuple(sorted(sum(clue[b * BOX + k][j] for k in range(BOX)) for b in range(BOX)))
+                     for j in range(SIZE)])
+
+    for _ in range(2):
+        rows, columns = (
+            ranks([(rows[i], tuple(sorted(columns[j] for j in range(SIZE) if clue[i][j]))) for i in range(SIZE)]),
+            ranks([(columns[j], tuple(sorted(rows[i] for i in range(SIZE) if clue[i][j]))) for j in range(SIZE)]),
+        )
+
+    return rows, columns
+
+
+def tie_orders(items, key):
+    """
+    All orders of items sorted by key, with equal keys in every possible order
+    input: items: list
+    input: key: function giving the sort key of an item
+    output: list of tuples
+    """
+    groups = []
+    for item in sorted(items, key=key):
+        if groups and key(groups[-1][0]) == key(item):
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+
+    orders = [()]
+    for group in groups:
+        orders = [order + extra for order in orders for extra in permutations(group)]
+        if len(orders) > MAX_ORDERS:
+            return orders[:MAX_ORDERS]
+
+    return orders
+
+
+def line_orders(colors):
+    """
+    Orders of the 9 lines (rows or columns) that keep the 3-line groups together,
+    with groups and lines in each group sorted by their labels
+    input: colors: list of 9 line labels
+    output: list of tuples of 9 line indexes
+    """
+    within = [tie_orders(range(g * BOX, g * BOX + BOX), lambda line: colors[line]) for g in range(BOX)]
+    groups = tie_orders(range(BOX), lambda g: sorted(colors[g * BOX + k] for k in range(BOX)))
+
+    orders = []
+    for group_order in groups:
+        for parts in product(*(within[g] for g in group_order)):
+            orders.append(sum(parts, ()))
+            if len(orders) >= MAX_ORDERS:
+                return orders
+
+    return orders
+
+
+def canonical(board):
+    """
+    input: board: 2d list of ints or Board
+    output: tuple (string key of 81 digits, Transform from the board to the key)
+    """
+    cells = cells_of(board)
+    transposed_cells = [cells[j * SIZE + i] for i in range(SIZE) for j in range(SIZE)]
+
+    best = None
+    for transposed, grid in ((False, cells), (True, transposed_cells)):
+        row_colors, column_colors = line_colors(grid)
+        row_orders = line_orders(row_colors)
+        column_orders = line_orders(column_colors)
+        if len(row_orders) * len(column_orders) > MAX_ORDERS:
+            column_orders = column_orders[:max(1, MAX_ORDERS // len(row_orders))]
+            row_orders = row_orders[:MAX_ORDERS // len(column_orders)]
+
+        for rows in row_orders:
+            for columns in column_orders:
+                labels = {}
+                key = []
+                for r in rows:
+                    base = r * SIZE
+                    for c in columns:
+                        value = grid[base + c]
+                        if value != EMPTY and value not in labels:
+                            labels[value] = len(labels) + 1
+                        key.append(labels.get(value, EMPTY))
+
+                if best is None or key < best[0]:
+                    best = (key, Transform(transposed, rows, columns, labels))
+
+    key, transform = best
+    return ''.join(map(str, key)), transform
+
+
+def to_canonical(solution, transform):
+    """
+    Writes a solved board in the canonical form of its puzzle
+    input: solution: 2d list of ints or Board
+    input: transform: Transform of the puzzle
+    output: string of 81 digits
+    """
+    labels = dict(transform.labels)
+    values = []
+    for r in range(SIZE):
+        for c in range(SIZE):
+            i, j = transform.source(r, c)
+            value = solution[i][j]
+
+            # Digits missing from the puzzle get the next labels as they show up
+            if value not in labels:
+                labels[value] = len(labels) + 1
+            values.append(str(labels[value]))
+
+    return ''.join(values)
+
+
+def from_canonical(key_solution, transform, board):
+    """
+    Fills board in place with a canonical solution mapped back through transform
+    input: key_solution: string of 81 digits from to_canonical
+    input: transform: Transform of board's puzzle
+    input: board: 2d list of ints or Board
+    """
+    digits = {label: digit for digit, label in transform.labels.items()}
+
+    # Digits missing from the puzzle are interchangeable, so any order works
+    missing = [digit for digit in range(1, SIZE + 1) if digit not in transform.labels]
+    for label, digit in zip(range(len(digits) + 1, SIZE + 1), missing):
+        digits[label] = digit
+
+    for r in range(SIZE):
+        for c in range(SIZE):
+            i, j = transform.source(r, c)
+            board[i][j] = digits[int(key_solution[r * SIZE + c])]
+
+
+class SolutionCache:
+    """
+    LRU cache of canonical puzzle -> canonical solution (None if there is none)
+    in front of backends.solve
+    """
+    def __init__(self, maxsize=100000, path=None, backend='backtrack'):
+        """
+        input: maxsize: int number of puzzles kept before the least recently used go
+        input: path: string file to load from now and save to with save(), or None
+        input: backend: solver engine for cache misses (see backends.py)
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.backend = backend
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def solve(self, board, timeout=None, max_nodes=None):
+        """
+        Solves a board in place, from the cache when an equivalent puzzle was seen before
+        input: board: 2d list of ints or Board with 0 for the empty squares
+        input: timeout, max_nodes: give up on a cache miss after this many seconds / guesses,
+            or None (see instrument.Stats). A puzzle given up on is left as it was and not cached.
+        output: bool for whether a solution was found
+        """
+        if len(board) != SIZE:
+            # The canonical form is only worked out for 9x9 boards
+            return bool(self.search(board, timeout, max_nodes))
+
+        key, transform = canonical(board)
+
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            solution = self.entries[key]
+        else:
+            self.misses += 1
+            solved = [list(row) for row in board]
+            found = self.search(solved, timeout, max_nodes)
+            if found is None:
+                return False
+
+            solution = to_canonical(solved, transform) if found else None
+            self.store(key, solution)
+
+        if solution is None:
+            return False
+
+        from_canonical(solution, transform, board)
+        return True
+
+    def search(self, board, timeout=None, max_nodes=None):
+        """
+        Solves a cache miss in place with the backend
+        input: board: 2d list of ints with 0 for the empty squares
+        input: timeout, max_nodes: same as solve
+        output: bool for whether a solution was found, or None if a limit was hit first
+        """
+        if timeout is None and max_nodes is None:
+            return backends.solve(board, self.backend)
+
+        stats = instrument.profile(board, self.backend, timeout=timeout, max_nodes=max_nodes)
+        return None if stats.gave_up else stats.solved
+
+    def store(self, key, solution):
+        """
+        Adds an entry, evicting the least recently used ones over maxsize
+        """
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        """
+        output: dict of hits, misses, size and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def save(self, path=None):
+        """
+        Writes the entries, oldest first, one 'key solution' line each ('-' for no solution)
+        input: path: string file (default: the path given when the cache was made)
+        """
+        path = path or self.path
+        with open(path, 'w') as file:
+            for key, solution in self.entries.items():
+                file.write('{} {}\n'.format(key, solution or '-'))
+
+    def load(self, path):
+        """
+        Adds the entries of a file written by save
+        input: path: string file
+        """
+        with open(path) as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) != 2:
+                    continue
+                key, solution = parts
+                self.store(key, None if solution == '-' else solution)
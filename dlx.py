@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+"""
+Dancing Links (Knuth's Algorithm X) sudoku solver
+"""
+
+"""
+Sudoku as an exact cover problem: every (row, column, digit) choice is a row of a
+0/1 matrix with a 1 in four constraint columns:
+
+1. the square (row, column) is filled
+2. the digit is in the row
+3. the digit is in the column
+4. the digit is in the box
+
+A solution is a set of rows covering every column exactly once. Algorithm X finds
+it by always picking the column with the fewest rows left, trying each of those
+rows and covering every column it touches. Dancing links stores the matrix as
+circular doubly linked lists so covering and uncovering are just pointer swaps.
+
+The links are kept in flat lists indexed by node number (0 is the root, 1..columns
+are the column headers) since that is a lot faster in Python than node objects.
+Works for any N^2 x N^2 board (9x9, 16x16, 25x25, ...).
+"""
+
+from math import isqrt
+
+from bitmask import layout
+
+EMPTY = 0
+
+
+class DancingLinks:
+    """
+    The exact cover matrix for one board. solved and nodes are filled in by run.
+    """
+    # Stats collected while searching, only set on the traced links from instrument.py
+    stats = None
+
+    def __init__(self, board):
+        self.board = board
+        self.size = len(board)
+        self.box = isqrt(self.size)
+        if self.box * self.box != self.size or any(len(row) != self.size for row in board):
+            raise ValueError("Board must be N^2 x N^2, got {} rows".format(self.size))
+
+        self.nodes = 0
+        self.solved = False
+        self.solution = []
+
+        size = self.size
+        columns = 4 * size * size
+
+        # Node 0 is the root, then one header per column
+        self.left = [i - 1 for i in range(columns + 1)]
+        self.right = [i + 1 for i in range(columns + 1)]
+        self.left[0] = columns
+        self.right[columns] = 0
+        self.up = list(range(columns + 1))
+        self.down = list(range(columns + 1))
+        self.column = list(range(columns + 1))
+        self.choice = [None] * (columns + 1)
+        self.count = [0] * (columns + 1)
+
+        # First node of each (row, column, digit) choice
+        self.first = {}
+
+        box_of = layout(size).box_of
+        for i in range(size):
+            for j in range(size):
+                b = box_of[i][j]
+                for number in range(1, size + 1):
+                    d = number - 1
+                    self.add_row((i, j, number), (
+                        1 + i * size + j,
+                        1 + size * size + i * size + d,
+                        1 + 2 * size * size + j * size + d,
+                        1 + 3 * size * size + b * size + d,
+                    ))
+
+    def add_row(self, choice, headers):
+        """
+        Appends one matrix row with a node under each of the given column headers
+        input: choice: (row, column, digit) tuple the matrix row stands for
+        input: headers: tuple of column header node numbers
+        """
+        start = len(self.column)
+        for k, header in enumerate(headers):
+            node = start + k
+            self.column.append(header)
+            self.choice.append(choice)
+            self.left.append(start + (k - 1) % len(headers))
+            self.right.append(start + (k + 1) % len(headers))
+
+            # Link in at the bottom of the column
+            self.up.append(self.up[header])
+            self.down.append(header)
+            self.down[self.up[header]] = node
+            self.up[header] = node
+            self.count[header] += 1
+
+        self.first[choice] = start
+
+    def cover(self, c):
+        """
+        Removes column c and every row that has a node in it
+        """
+        left, right, up, down, column, count = self.left, self.right, self.up, self.down, self.column, self.count
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                count[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c):
+        """
+        Undoes cover(c), relinking in the exact opposite order
+        """
+        left, right, up, down, column, count = self.left, self.right, self.up, self.down, self.column, self.count
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                count[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    def select(self, node):
+        """
+        Commits to the matrix row of node by covering all of its columns
+        input: node: int, any node of the row
+        """
+        self.cover(self.column[node])
+        j = self.right[node]
+        while j != node:
+            self.cover(self.column[j])
+            j = self.right[j]
+
+    def deselect(self, node):
+        """
+        Undoes select(node)
+        """
+        j = self.left[node]
+        while j != node:
+            self.uncover(self.column[j])
+            j = self.left[j]
+        self.uncover(self.column[node])
+
+    def search(self):
+        """
+        Algorithm X over the remaining columns
+        output: bool for whether an exact cover was found (kept in self.solution)
+        """
+        right, down, count = self.right, self.down, self.count
+
+        if right[0] == 0:
+            return True
+
+        # Column with the fewest rows left
+        c = right[0]
+        best = count[c]
+        k = right[c]
+        while k != 0 and best > 1:
+            if count[k] < best:
+                c, best = k, count[k]
+            k = right[k]
+
+        if best == 0:
+            return False
+
+        r = down[c]
+        while r != c:
+            self.select(r)
+            self.solution.append(self.choice[r])
+            self.nodes += 1
+
+            # Recursive check
+            if self.search():
+                return True
+
+            self.solution.pop()
+            self.deselect(r)
+            r = down[r]
+
+        return False
+
+
+def run(board, stats=None):
+    """
+    Solves a sudoku board in place and keeps the matrix for inspection
+    input: board: 2d list of N^2 lists of N^2 ints with 0 for the empty squares
+    input: stats: instrument.Stats to count the search in, or None to run untraced
+    output: DancingLinks used for the search (see its solved and nodes)
+    """
+    if stats is None:
+        links = DancingLinks(board)
+    else:
+        # Only needed when tracing (instrument.py imports this file)
+        from instrument import TracedLinks
+        links = TracedLinks(board)
+    size = links.size
+
+    # Starting numbers are rows that must be in the cover
+    covered = set()
+    for i in range(size):
+        for j in range(size):
+            number = board[i][j]
+            if number == EMPTY:
+                continue
+            if not 1 <= number <= size:
+                return links
+
+            node = links.first[(i, j, number)]
+            headers = {links.column[node + k] for k in range(4)}
+            if headers & covered:
+                # Two starting numbers break the same rule
+                return links
+            covered |= headers
+            links.select(node)
+
+    # The starting numbers aren't part of the search
+    links.stats = stats
+    if links.search():
+        for i, j, number in links.solution:
+            board[i][j] = number
+        links.solved = True
+
+    return links
+
+
+def solve(board):
+    """
+    Solves a sudoku board in place with Dancing Links
+    input: board: 2d list of N^2 lists of N^2 ints with 0 for the empty squares
+    output: bool for whether a solution was found
+    """
+    return run(board).solved
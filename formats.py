@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+"""
+Reading and writing files of many sudoku puzzles
+"""
+
+"""
+Formats:
+1. 'line' (SDM): one puzzle per line, 81 characters read like a book with '0' or '.'
+    for the empty squares (256 / 625 with A-P for bigger boards), see batch.py
+2. 'grid' (SadMan .sdk, or .grid): the board as rows of text, one row per line, the way it is printed.
+    Spaces, '|', '-' and '+' are ignored, so print_board's output reads back in.
+    Several puzzles can follow each other in one file.
+3. 'jsonl': one JSON object per line, {"puzzle": "<line>"} plus any other fields
+    (difficulty, source, ...) which read_records hands back as a dict
+4. 'packed': b'SDKP', a 2 byte version and a 2 byte board size, then 41 bytes per
+    9x9 puzzle, two squares a byte like the puzzle store (store.py). Only 9x9 boards
+    fit, a square needs 4 bits.
+
+Every reader is a generator reading the file in big blocks, so even huge files never
+sit in memory, and every writer takes any iterable of boards. The line, grid and
+jsonl formats are text files, packed is binary (see MODES).
+
+With validate=True every puzzle read is written back out and compared with what was
+read (so nothing got lost on the way), and checked for two equal numbers in a unit.
+
+    with open('puzzles.jsonl') as file:
+        for board in formats.read_puzzles(file, 'jsonl', validate=True):
+            ...
+"""
+
+import json
+import os
+import struct
+
+from batch import BLANKS, format_board, numbered, parse_line
+from bitmask import BitBoard
+from board import SYMBOLS, Board
+
+FORMATS = ('line', 'grid', 'jsonl', 'packed')
+
+# How each format's files have to be opened
+MODES = {'line': '', 'grid': '', 'jsonl': '', 'packed': 'b'}
+
+# Format used for a file extension when none is given
+EXTENSIONS = {'.txt': 'line', '.sdm': 'line', '.sdk': 'grid', '.grid': 'grid', '.jsonl': 'jsonl', '.bin': 'packed'}
+
+SIZE = 9
+MAGIC = b'SDKP'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+RECORD_SIZE = (SIZE * SIZE + 1) // 2
+
+# Records read from a packed file at a time
+CHUNK = 4096
+
+# Each byte's high and low nibble, to unpack a record with two translates
+HIGH = bytes(byte >> 4 for byte in range(256))
+LOW = bytes(byte & 0x0F for byte in range(256))
+
+# Characters in a grid row that are just decoration
+DECORATION = ' \t|-+'
+
+# Lengths of a whole puzzle on one line (9x9, 16x16 and 25x25), anything else is a grid row
+LINE_LENGTHS = (81, 256, 625)
+
+
+def guess_format(path):
+    """
+    input: path: string file name
+    output: one of FORMATS, from the extension ('line' if it isn't known)
+    """
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'line')
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError("Unknown format '{}', expected one of {}".format(fmt, FORMATS))
+
+
+def open_puzzles(path, mode='r', fmt=None):
+    """
+    Opens a puzzle file the way its format needs (text or binary)
+    input: path: string file name
+    input: mode: 'r' or 'w'
+    input: fmt: one of FORMATS, or None to go by the extension
+    output: tuple (open file, format)
+    """
+    fmt = fmt or guess_format(path)
+    check_format(fmt)
+    return open(path, mode + MODES[fmt]), fmt
+
+
+def pack(board):
+    """
+    input: board: 9x9 Board or 2d list of ints
+    output: bytes of length RECORD_SIZE, the first square in the high nibble of the first byte
+    """
+    cells = board.cells if isinstance(board, Board) else bytes(value for row in board for value in row)
+    if len(cells) != SIZE * SIZE:
+        raise ValueError("The packed format only holds 9x9 boards, got {} squares".format(len(cells)))
+
+    # Every byte of high is below 16, so shifting the whole thing by 4 moves each one
+    # into its own byte's high nibble
+    high = int.from_bytes(cells[0::2], 'big')
+    low = int.from_bytes(cells[1::2] + b'\0', 'big')
+    return ((high << 4) | low).to_bytes(RECORD_SIZE, 'big')
+
+
+def unpack(record):
+    """
+    input: record: bytes of length RECORD_SIZE
+    output: Board
+    """
+    cells = bytearray(RECORD_SIZE * 2)
+    cells[0::2] = record.translate(HIGH)
+    cells[1::2] = record.translate(LOW)
+    del cells[SIZE * SIZE:]
+    return Board(cells, SIZE)
+
+
+def check(board, source, written):
+    """
+    Raises ValueError if a board read doesn't write back out the same, or breaks a rule
+    input: board: Board that was read
+    input: source: what it was read from
+    input: written: what board writes back out as, to compare with source
+    """
+    if written != source:
+        raise ValueError("Reads back as {!r}".format(written))
+    if not BitBoard(board.copy()).consistent:
+        raise ValueError("The same number twice in a row, column or box")
+
+
+def read_lines(lines, validate=False):
+    """
+    Same as batch.read_puzzles, with validation
+    """
+    for number, line in numbered(lines):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        try:
+            board = parse_line(line)
+            if validate:
+                check(board, line.upper().replace('.', '0'), format_board(board))
+        except ValueError as error:
+            raise ValueError("Line {}: {}".format(number, error)) from None
+        yield board
+
+
+def parse_rows(rows):
+    """
+    input: rows: list of strings, the rows of one board (decoration already left out)
+    output: Board
+    """
+    return parse_line(''.join(rows))
+
+
+def read_grids(lines, validate=False):
+    """
+    input: lines: iterable of strings, rows of text with any number of boards one after another
+    output: generator of Boards
+    """
+    rows = []
+    start = 0
+    for number, line in numbered(lines):
+        line = line.strip()
+        if line.startswith('#') or line.startswith('['):
+            continue
+
+        row = ''.join(char for char in line if char not in DECORATION)
+        if not row:
+            continue
+
+        if not rows:
+            start = number
+        rows.append(row)
+
+        # The first row says how big the board is
+        if len(rows) == len(rows[0]):
+            try:
+                board = parse_rows(rows)
+                if validate:
+                    check(board, ''.join(rows).upper().replace('.', '0'), format_board(board))
+            except ValueError as error:
+                raise ValueError("Board at line {}: {}".format(start, error)) from None
+            yield board
+            rows = []
+
+    if rows:
+        raise ValueError("Board at line {}: only {} of {} rows".format(start, len(rows), len(rows[0])))
+
+
+def format_grid(board):
+    """
+    input: board: Board or 2d list of ints
+    output: string of the rows, one per line, with '.' for the empty squares
+    """
+    size = len(board)
+    text = format_board(board).replace('0', '.')
+    return '\n'.join(text[k:k + size] for k in range(0, size * size, size))
+
+
+def read_records(lines, validate=False):
+    """
+    input: lines: iterable of JSON Lines strings
+    output: generator of (Board, dict of the other fields) tuples
+    """
+    for number, line in numbered(lines):
+        if not line.strip():
+            continue
+
+        try:
+            fields = json.loads(line)
+            if not isinstance(fields, dict) or not isinstance(fields.get('puzzle'), str):
+                raise ValueError('Expected an object with a "puzzle" string')
+            puzzle = fields.pop('puzzle')
+            board = parse_line(puzzle)
+            if validate:
+                check(board, puzzle.upper().replace('.', '0'), format_board(board))
+        except ValueError as error:
+            raise ValueError("Line {}: {}".format(number, error)) from None
+        yield board, fields
+
+
+def write_records(file, records):
+    """
+    input: file: open text file
+    input: records: iterable of (board, dict of other fields, or None) tuples
+    output: int number of puzzles written
+    """
+    count = 0
+    for board, fields in records:
+        record = {'puzzle': format_board(board)}
+        record.update(fields or {})
+        file.write(json.dumps(record) + '\n')
+        count += 1
+
+    return count
+
+
+def read_packed(file, validate=False):
+    """
+    input: file: open binary file in the packed format
+    output: generator of Boards
+    """
+    header = file.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise ValueError("Not a packed puzzle file")
+    magic, version, size = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or size != SIZE:
+        raise ValueError("Not a version {} packed file of {}x{} puzzles".format(VERSION, SIZE, SIZE))
+
+    number = 0
+    rest = b''
+    while True:
+        block = file.read(RECORD_SIZE * CHUNK)
+        if not block:
+            break
+        if rest:
+            block = rest + block
+
+        end = len(block) - len(block) % RECORD_SIZE
+        for offset in range(0, end, RECORD_SIZE):
+            number += 1
+            record = block[offset:offset + RECORD_SIZE]
+            board = unpack(record)
+            if validate:
+                try:
+                    if max(board.cells) > SIZE:
+                        raise ValueError("Square holds {}".format(max(board.cells)))
+                    check(board, record, pack(board))
+                except ValueError as error:
+                    raise ValueError("Puzzle {}: {}".format(number, error)) from None
+            yield board
+        rest = block[end:]
+
+    if rest:
+        raise ValueError("Puzzle {}: cut off after {} bytes".format(number + 1, len(rest)))
+
+
+def write_packed(file, boards):
+    """
+    input: file: open binary file
+    input: boards: iterable of 9x9 boards
+    output: int number of puzzles written
+    """
+    file.write(HEADER.pack(MAGIC, VERSION, SIZE))
+    count = 0
+    for board in boards:
+        file.write(pack(board))
+        count += 1
+
+    return count
+
+
+def read_puzzles(file, fmt='line', validate=False):
+    """
+    input: file: open file (binary for 'packed', text otherwise)
+    input: fmt: one of FORMATS
+    input: validate: bool, check every puzzle as described at the top of the file
+    output: generator of Boards
+    """
+    check_format(fmt)
+    if fmt == 'line':
+        return read_lines(file, validate)
+    if fmt == 'grid':
+        return read_grids(file, validate)
+    if fmt == 'jsonl':
+        return (board for board, fields in read_records(file, validate))
+
+    return read_packed(file, validate)
+
+
+def write_puzzles(file, boards, fmt='line'):
+    """
+    input: file: open file (binary for 'packed', text otherwise)
+    input: boards: iterable of boards
+    input: fmt: one of FORMATS
+    output: int number of puzzles written
+    """
+    check_format(fmt)
+    if fmt == 'packed':
+        return write_packed(file, boards)
+    if fmt == 'jsonl':
+        return write_records(file, ((board, None) for board in boards))
+
+    count = 0
+    for board in boards:
+        file.write((format_grid(board) + '\n\n') if fmt == 'grid' else (format_board(board) + '\n'))
+        count += 1
+
+    return count
+
+
+def parse_text(text):
+    """
+    Reads the first puzzle out of any text, e.g. pasted from the clipboard: a puzzle
+    line, a JSON Lines record or a printed grid
+    input: text: string
+    output: Board
+    """
+    text = text.strip()
+    if text.startswith('{'):
+        return next(read_records(text.splitlines()))[0]
+
+    for line in text.splitlines():
+        line = line.strip()
+        if len(line) in LINE_LENGTHS and all(char in SYMBOLS or char in BLANKS for char in line.upper()):
+            return parse_line(line)
+
+    try:
+        return next(read_grids(text.splitlines()))
+    except StopIteration:
+        raise ValueError("No puzzle found") from None
+
+
+def load(path, index=0, fmt=None):
+    """
+    input: path: string puzzle file
+    input: index: int puzzle of the file to get, counting from 0
+    input: fmt: one of FORMATS, or None to go by the extension
+    output: Board
+    """
+    file, fmt = open_puzzles(path, 'r', fmt)
+    with file:
+        for number, board in enumerate(read_puzzles(file, fmt)):
+            if number == index:
+                return board
+
+    raise IndexError("{} has no puzzle {}".format(path, index))
@@ -6,12 +6,37 @@ Bryce Frentz
 September 2020
 """
 
-import pygame
+import argparse
+import queue
+import threading
 import time
-import requests
-import json
+from functools import lru_cache
+from math import isqrt
 
-pygame.font.init()
+import backends
+import batch
+import formats
+import instrument
+import logic
+from bitmask import BitBoard, digits
+from board import SYMBOLS, Board
+
+# pygame is only imported by the functions that draw or read input, so the grid and the
+# auto solver can be used (and tested) without it
+
+# Auto solve steps shown per second, and the most steps shown in one frame
+SOLVE_SPEED = 10
+FRAME_BUDGET = 50
+
+# Most solve steps the worker gets ahead of the animation
+QUEUE_SIZE = 1000
+
+# Frames per second of the game loop, it sleeps the rest of the time
+FPS = 30
+
+# Colours of the values and the sketched values
+BLACK = (0, 0, 0)
+GREY = (128, 128, 128)
 
 """
 The basic idea in the backtracking algorithm is to just to test each new solution 
@@ -48,77 +73,203 @@ class Grid:
 
     #board = get_board()
 
-    def __init__(self, rows, columns, width, height, win):
+    def __init__(self, rows, columns, width, height, win, backend='backtrack', board=None):
+        if board is not None:
+            self.board = board
+
         self.rows = rows
         self.columns = columns
         self.width = width
         self.height = height
-        self.model = None
         self.selected = None
         #self.board = get_board()
-        self.cubes = [[Cube(self.board[i][j], i, j, width, height) for j in range(columns)] for i in range(rows)]
+        self.cubes = [[Cube(self.board[i][j], i, j, width, height, rows) for j in range(columns)] for i in range(rows)]
         self.win = win
+        self.backend = backend
+        self.solver = None
 
-    def update_model(self):
-        """
-        The model is a 'behind the scenes board'
-        Used for when the program sends the board to solve to see. 
-        Needs to be updated for each state and doesn't care about sketch values.
-        Just resets the model board to the actual board values
-        """
-        self.model = [[self.cubes[i][j].value for j in range(self.columns)] for i in range(self.rows)]
+        # Grid lines without any numbers, made on the first draw
+        self.background = None
+
+        # The model is a 'behind the scenes board' holding the placed values (no sketches).
+        # The bitmask state is kept in step with it on every place, so nothing is ever rebuilt.
+        self.model = Board(self.board)
+        self.state = BitBoard(self.model)
+
+        # Candidate mask of every empty square by square number (0 for filled ones), updated
+        # on every place so checking a move, the pencil marks and hints never scan the board
+        self.candidates = logic.masks(self.state)
+        self.pencil = False
+
+        # Squares highlighted because they hold the value sketched in the selected square
+        self.conflicts = []
+
+        # Solved once up front so checking a move is just a lookup. On a board with more
+        # than one solution a move that differs from it can still be right, so those
+        # moves get a real search.
+        self.solution = None
+        self.solve()
+        self.unique = logic.has_unique_solution(self.model)
 
     def place(self, val):
         """
         Determines the ability to place a value in this square.
-        First, checks if the value is valid for the square and then calls the 
-        solve method to see if we can come to solution
-        from this decision. 
+        The value is correct if it matches the solution found when the board was loaded,
+        or (if the board has several solutions) if the board can still be solved with it.
         input: val: the int value the user is putting in the square.
         output: bool for whether or not the move is correct.
         """
         row, column = self.selected
         if self.cubes[row][column].value == 0:
-            self.cubes[row][column].set(val)
-            self.update_model()
-
-            if valid_number(self.model, val, (row,column)) and self.solve():
+            if self.solution is not None and self.solution[row][column] == val:
+                correct = True
+            elif self.unique or not self.candidates[row * self.columns + column] & (1 << val):
+                correct = False
+            else:
+                trial = self.model.copy()
+                trial[row][column] = val
+                correct = backends.solve(trial, self.backend)
+                if correct:
+                    self.solution = trial
+
+            self.show_conflicts(0)
+            if correct:
+                self.fill(val, (row, column))
                 return True
             else:
-                self.cubes[row][column].set(0)
                 self.cubes[row][column].set_temp(0)
-                self.update_model()
                 return False
 
+    def fill(self, val, position):
+        """
+        Puts a value on the board and takes it out of the candidates of its peers
+        input: val: int value to put in the square
+        input: position: tuple (row, column) of an empty square
+        """
+        row, column = position
+        cell = row * self.columns + column
+        self.cubes[row][column].set(val)
+        self.state.place(val, position)
+        self.candidates[cell] = 0
+
+        clear = ~(1 << val)
+        for peer in self.state.layout.peers_of[cell]:
+            if self.candidates[peer] & ~clear:
+                self.candidates[peer] &= clear
+                if self.pencil:
+                    i, j = self.state.layout.positions[peer]
+                    self.cubes[i][j].dirty = True
+
     def sketch(self, val):
         """
         Places the temporary value
         input: int val is the temporary value in the spot before confirmation
         """
         row, column = self.selected
-        self.cubes[row][column].set_temp(val)
+        if self.cubes[row][column].temp != val:
+            self.cubes[row][column].set_temp(val)
+            self.show_conflicts(val)
+
+    def show_conflicts(self, val):
+        """
+        Highlights the squares that already hold the value sketched in the selected
+        square (and the selected square itself if there are any)
+        input: val: int sketched value, or 0 to clear the highlights
+        """
+        for i, j in self.conflicts:
+            self.cubes[i][j].set_conflict(False)
+        self.conflicts = []
+
+        if val == 0:
+            return
+        row, column = self.selected
+        cell = row * self.columns + column
+        if self.cubes[row][column].value != 0 or self.candidates[cell] & (1 << val):
+            return
+
+        cells = self.model.cells
+        self.conflicts = [self.state.layout.positions[peer] for peer in self.state.layout.peers_of[cell]
+                          if cells[peer] == val]
+        if self.conflicts:
+            self.conflicts.append((row, column))
+        for i, j in self.conflicts:
+            self.cubes[i][j].set_conflict(True)
+
+    def toggle_pencil(self):
+        """
+        Shows or hides the candidates of every empty square
+        """
+        self.pencil = not self.pencil
+        for i in range(self.rows):
+            for j in range(self.columns):
+                if self.cubes[i][j].value == 0:
+                    self.cubes[i][j].dirty = True
+
+    def hint(self):
+        """
+        Finds a square that a naked or hidden single fills in (see logic.next_step) and selects it
+        output: (number, reason) for the hint, or None if the singles don't get any further
+        """
+        step = logic.next_step(self.state, self.candidates)
+        if step is None:
+            return None
+
+        number, (row, column), reason = step
+        self.select(row, column)
+        return number, reason
+
+
+    def draw(self, full=False):
+        """
+        Draws the squares that changed since the last draw, or the whole grid
+        input: full: bool to draw everything (the first frame, or after the window was covered)
+        output: list of pygame Rects that were drawn over
+        """
+        if self.background is None:
+            self.background = self.draw_lines()
+
+        if full:
+            self.win.blit(self.background, (0, 0))
+
+        rects = []
+        for row in self.cubes:
+            for cube in row:
+                if full or cube.dirty:
+                    rect = cube.rect()
+                    if not full:
+                        self.win.blit(self.background, rect, rect)
+                    cube.draw(self.win, self.candidates[cube.row * self.columns + cube.column] if self.pencil else 0)
+                    cube.dirty = False
+                    rects.append(rect)
 
+        if full:
+            return [self.background.get_rect()]
 
-    def draw(self):
+        return rects
+
+    def draw_lines(self):
         """
-        Draws the grid window, cubes, and lines
-        input: pygame window
+        Draws the empty grid once, the squares are drawn over it
+        output: pygame Surface with the grid lines, thicker around the boxes
         """
-        # Draw grid lines
-        gap = self.width / 9
+        import pygame
+
+        # A little taller than the grid so the bottom line isn't cut in half
+        surface = pygame.Surface((int(self.width), int(self.height) + 3))
+        surface.fill((255,255,255))
+
+        gap = self.width / self.rows
+        box = isqrt(self.rows)
         for i in range(self.rows+1):
-            if i%3 == 0 and i != 0:
+            if i%box == 0 and i != 0:
                 thickness = 4
             else:
                 thickness = 1
 
-            pygame.draw.line(self.win, (0,0,0), (0,i*gap), (self.width, i*gap), thickness)
-            pygame.draw.line(self.win, (0,0,0), (i*gap, 0), (i*gap, self.height), thickness)
+            pygame.draw.line(surface, (0,0,0), (0,i*gap), (self.width, i*gap), thickness)
+            pygame.draw.line(surface, (0,0,0), (i*gap, 0), (i*gap, self.height), thickness)
 
-        # Draw cubes
-        for i in range(self.rows):
-            for j in range(self.columns):
-                self.cubes[i][j].draw(self.win)
+        return surface
 
 
     def select(self, row, column):
@@ -126,12 +277,15 @@ class Grid:
         Chooses the active square and updates the selected position
         input: int row, column are the location of the current cell
         """
-        # Reset others
-        for i in range(self.rows):
-            for j in range(self.columns):
-                self.cubes[i][j].selected = False
+        # Reset the last one
+        self.show_conflicts(0)
+        if self.selected is not None:
+            cube = self.cubes[self.selected[0]][self.selected[1]]
+            cube.selected = False
+            cube.dirty = True
 
         self.cubes[row][column].selected = True
+        self.cubes[row][column].dirty = True
         self.selected = (row, column)
 
 
@@ -142,6 +296,7 @@ class Grid:
         row, column = self.selected
         if self.cubes[row][column].value == 0:
             self.cubes[row][column].set_temp(0)
+            self.show_conflicts(0)
 
 
     def click(self, position):
@@ -151,7 +306,7 @@ class Grid:
         """
 
         if position[0] < self.width and position[1] < self.height:
-            gap = self.width / 9
+            gap = self.width / self.columns
             x = position[0] // gap
             y = position[1] // gap
             return (int(y), int(x))
@@ -174,155 +329,272 @@ class Grid:
 
     def solve(self):
         """
-        Solves a sudoku board recursively using backtracking
-        input: board: 2d list of ints and empty character (could be 'X', 0, or whatever)
-        output: solved board
+        Solves a copy of the model board with the grid's backend and keeps it as the solution
+        output: bool for whether the model could be solved
         """
-        # Check and return for last square
-        empty = find_empty(self.model)
-        if not empty:
-            return True
+        solution = self.model.copy()
+        if backends.solve(solution, self.backend):
+            self.solution = solution
         else:
-            row, column = empty
-
-        # Loop through numbers 1-9 to see if they work
-        for i in range(1, 10):
-            if valid_number(self.model, i, (row, column)):
-                self.model[row][column] = i
+            self.solution = None
 
-                # Recursive check
-                if self.solve():
-                    return True
+        return self.solution is not None
 
-                self.model[row][column] = 0
+    def solving(self):
+        """
+        output: bool for whether an auto solve is running
+        """
+        return self.solver is not None
 
-        return False
+    def start_solve(self, speed=SOLVE_SPEED, budget=FRAME_BUDGET):
+        """
+        Starts automatically solving the whole board. The solve runs in a worker thread
+        (see AutoSolver) and update_solve shows its steps a few at a time, so the game
+        keeps drawing and taking keys while it goes.
+        It shows the grid's own engine at work: its guesses and backtracks, and for the
+        'backtrack' and 'iterative' backends also what logic fills in and takes back.
+        input: speed: float steps shown per second, or 0 to show them as fast as the frames allow
+        input: budget: int most steps shown in one frame
+        """
+        self.solver = AutoSolver(self.model, self.backend)
+        self.speed = speed
+        self.budget = budget
+        self.shown = 0
+        self.solve_start = time.perf_counter()
 
-    def solve_board(self):
+    def update_solve(self):
         """
-        Automatically solves the whole board by recursively solving the object's model board. 
+        Shows the solve steps due by now (at most the frame budget), called once per frame
+        output: None while the solve is running, else bool for whether the board was solved
         """
-        # Resets model to match board
-        self.update_model()
-        
-        # Check if any empty squares
-        empty = find_empty(self.model)
-        if not empty:
-            return True
+        solver = self.solver
+        if solver.skip.is_set():
+            due = -1
+        elif self.speed:
+            due = int((time.perf_counter() - self.solve_start) * self.speed) - self.shown
+            due = max(0, min(self.budget, due))
         else:
-            row, column = empty
-
-        # loop through the numbers to see if they work
-        for i in range(1, 10):
-            if valid_number(self.model, i, (row, column)):
-                self.model[row][column] = i
-                self.cubes[row][column].set(i)
-                self.cubes[row][column].draw_solve(self.win, True)
-                self.update_model()
-                pygame.display.update()
-                pygame.time.delay(100)
-
-                if self.solve_board():
-                    return True
-
-                self.model[row][column] = 0
-                self.cubes[row][column].set(0)
-                self.update_model()
-                self.cubes[row][column].draw_solve(self.win, False)
-                pygame.display.update()
-                pygame.time.delay(100)
-
-        return False
-       
+            due = self.budget
+
+        # Checked before the queue is emptied, so no step can come in after the last one is taken
+        running = solver.thread.is_alive()
+        while due:
+            try:
+                event, number, (row, column) = solver.steps.get_nowait()
+            except queue.Empty:
+                break
+            due -= 1
+            self.shown += 1
+            if solver.skip.is_set():
+                continue
+
+            cube = self.cubes[row][column]
+            cube.dirty = True
+            if event in ('guess', 'place'):
+                cube.set(number)
+                cube.mark = (0, 255, 0)
+            else:
+                cube.set(0)
+                cube.mark = (255, 0, 0)
+
+        if running or not solver.steps.empty():
+            return None
+
+        return self.end_solve()
+
+    def finish_solve(self):
+        """
+        Skips the rest of the animation, the board fills in as soon as the worker is done
+        """
+        self.solver.skip.set()
+
+    def cancel_solve(self):
+        """
+        Stops the solve, the board goes back to how it was before it started
+        """
+        self.solver.cancel.cancel()
+        self.solver.skip.set()
+
+    def end_solve(self):
+        """
+        Puts the worker's result on the board: the solution if it found one, otherwise
+        the squares go back to the model's values
+        output: bool for whether the board was solved
+        """
+        solver, self.solver = self.solver, None
+        solved = not solver.cancel.cancelled and solver.stats is not None and solver.stats.solved
+        for i in range(self.rows):
+            for j in range(self.columns):
+                cube = self.cubes[i][j]
+                if cube.mark is not None:
+                    cube.mark = None
+                    cube.dirty = True
+                if self.model[i][j] == 0 and solved:
+                    self.fill(solver.board[i][j], (i, j))
+                else:
+                    cube.set(self.model[i][j])
+
+        return solved
+
+
+class AutoSolver:
+    """
+    Solves a copy of a board in a worker thread, putting every step of the engine on a
+    queue for the game loop to show at its own pace
+    """
+    def __init__(self, board, backend='backtrack', strategy='logic'):
+        """
+        input: board: Board to solve, not changed
+        input: backend, strategy: same as backends.solve
+        """
+        self.board = board.copy()
+        self.backend = backend
+        self.strategy = strategy
+        self.stats = None
+
+        # Bounded, so the worker waits for the animation instead of running ahead of it
+        self.steps = queue.Queue(QUEUE_SIZE)
+        self.cancel = instrument.CancelToken()
+        self.skip = threading.Event()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        self.stats = instrument.profile(self.board, self.backend, self.strategy, hook=self.step, cancel=self.cancel)
+
+    def step(self, event, number, position):
+        """
+        Hook for instrument.Stats: queues the step, waiting while the queue is full
+        unless the animation has been skipped or the solve cancelled
+        """
+        while not (self.skip.is_set() or self.cancel.cancelled):
+            try:
+                self.steps.put((event, number, position), timeout=0.05)
+                return
+            except queue.Full:
+                pass
+
 
 class Cube:
     """
     Cubes are the individual squares within the board. They store/print their values and use their size info for drawing
     """
-    def __init__(self, value, row, column, width, height):
+    def __init__(self, value, row, column, width, height, size=9):
         self.value = value
         self.temp = 0
         self.row = row
         self.column = column
         self.width = width
         self.height = height
+        self.size = size
         self.selected = False
 
-    def draw(self, win):
+        # Colour of the box drawn around the square while the auto solve shows it, or None
+        self.mark = None
+
+        # Whether the square holds (or is) a value that breaks a rule with the sketched one
+        self.conflict = False
+
+        # Whether the square changed since it was last drawn
+        self.dirty = True
+
+    def rect(self):
         """
-        Draws the individual squares within the grid
-        input: win is the pygame window for the board
+        output: pygame Rect of the square in the window
         """
-        fnt = pygame.font.SysFont("comicsans", 40)
+        import pygame
 
-        gap = self.width / 9
-        x = self.column * gap
-        y = self.row * gap
+        gap = self.width / self.size
+        x = int(self.column * gap)
+        y = int(self.row * gap)
+        return pygame.Rect(x, y, int((self.column + 1) * gap) - x, int((self.row + 1) * gap) - y)
+
+    def draw(self, win, candidates=0):
+        """
+        Draws the individual squares within the grid, over whatever was there
+        input: win is the pygame window for the board
+        input: candidates: int mask of the pencil marks to show in an empty square
+        """
+        import pygame
+
+        rect = self.rect()
+        gap = self.width / self.size
+        x, y = rect.topleft
+
+        # Light red behind a conflicting value
+        if self.conflict:
+            win.fill((255,200,200), rect.inflate(-2, -2))
+
+        # Pencil marks, each digit in its own spot of a small box x box grid
+        if candidates and self.temp == 0 and self.value == 0:
+            box = isqrt(self.size)
+            small = gap / box
+            marks = glyphs(int(small * 2 / 3), GREY, self.size)
+            for number in digits(candidates):
+                text = marks[number]
+                k = number - 1
+                win.blit(text, (x + (k % box + 0.5) * small - text.get_width()/2,
+                                y + (k // box + 0.5) * small - text.get_height()/2))
 
         # Sketch the temp value
         if self.temp != 0 and self.value == 0:
-            text = fnt.render(str(self.temp), 1, (128,128,128))
+            text = glyphs(int(gap * 2 / 3), GREY, self.size)[self.temp]
             win.blit(text, (x+5, y+5))
-        
+
         # Draw the actual value
         elif not (self.value == 0):
-            text = fnt.render(str(self.value), 1, (0,0,0))
+            text = glyphs(int(gap * 2 / 3), BLACK, self.size)[self.value]
             win.blit(text, (x + (gap/2 - text.get_width()/2), y + (gap/2 - text.get_height()/2)))
 
+        # Green box for a guess, red box for a backtrack while auto solving
+        if self.mark is not None:
+            pygame.draw.rect(win, self.mark, rect, 3)
+
         # Red rectangle around active square
         if self.selected:
-            pygame.draw.rect(win, (255,0,0), (x,y,gap,gap), 3)
-
-
-    def draw_solve(self, win, g=True):
-        """
-        Draws the individual squares within the grid as the backtracking algorithm solves the board
-        input: win is the pygame window for the board
-        input: bool g is for if the box is green
-        """
-        fnt = pygame.font.SysFont("comicsans", 40)
-
-        gap = self.width / 9
-        x = self.column * gap
-        y = self.row * gap
-
-        pygame.draw.rect(win, (255, 255, 255), (x, y, gap, gap), 0)
-
-        # Draw value
-        text = fnt.render(str(self.value), 1, (0, 0, 0))
-        win.blit(text, (x + (gap / 2 - text.get_width() / 2), y + (gap / 2 - text.get_height() / 2)))
-
-        # Green box
-        if g:
-            pygame.draw.rect(win, (0, 255, 0), (x, y, gap, gap), 3)
-        # Red box
-        else:
-            pygame.draw.rect(win, (255, 0, 0), (x, y, gap, gap), 3)
-
-
+            pygame.draw.rect(win, (255,0,0), rect, 3)
 
     def set(self, val):
         """
         Change value
         input: int val is the value
         """
-        self.value = val
+        if val != self.value:
+            self.value = val
+            self.dirty = True
+
+    def set_conflict(self, conflict):
+        """
+        input: bool conflict for whether to highlight the square
+        """
+        if conflict != self.conflict:
+            self.conflict = conflict
+            self.dirty = True
 
     def set_temp(self, val):
         """
         Change temporary value
         input: int val
         """
-        self.temp = val
+        if val != self.temp:
+            self.temp = val
+            self.dirty = True
 
 
 
-def get_board():
+def get_board(difficulty=None, url=None):
     """
-    Gets a new board as a list of int lists from sugoku.com
-    output: 2d list of int lists for the starting board
+    Gets a random starting board from the local puzzle store (store.py), no network needed,
+    or from a sugoku style server if a url is given (falling back to the store, see remote.py)
+    input: difficulty: 'easy', 'medium' or 'hard', or None to ask for it
+    input: url: string server address, or None for the local store
+    output: Board for the starting board
     """
-    valid_difficulty = False
+    import remote
+    import store
+
+    valid_difficulty = difficulty is not None
     while not valid_difficulty:
         diff = input("What difficulty of sudoku puzzle (1=easy, 2=medium, 3=hard)? \n")
         if diff == '1':
@@ -337,91 +609,118 @@ def get_board():
         else:
             print("\nPlease input a valid difficulty.\n")
 
-    link = 'https://sugoku.herokuapp.com/board?difficulty='+difficulty
-    req = requests.get(link)
-    board = json.loads(req.text[9:-2])
-    return board
+    if url is not None:
+        return Board(remote.fetch_board(url, difficulty))
 
+    return store.random_board(difficulty)
 
-def find_empty(board):
+
+def paste_board():
     """
-    Finds the next empty space in the board
-    input: board: 2d list of ints and empty characters (could be 'X', 0, or whatever)
-    output: tuple (int, int) for row col of next empty spot
+    Reads a puzzle from the clipboard: a puzzle line, a JSON Lines record or a printed grid
+    (see formats.parse_text)
+    output: Board, or None if there isn't one
     """
-    for i in range(len(board)):
-        for j in range(len(board[0])):
-            if board[i][j] == 0:
-                return (i, j)    # (row, column)
+    import pygame
+
+    try:
+        if not pygame.scrap.get_init():
+            pygame.scrap.init()
+        if hasattr(pygame.scrap, 'get_text'):
+            text = pygame.scrap.get_text()
+        else:
+            text = (pygame.scrap.get(pygame.SCRAP_TEXT) or b'').decode('utf-8', 'ignore').strip('\0')
+    except pygame.error as error:
+        print('Could not read the clipboard ({}).'.format(error))
+        return None
 
-    # If there are no more empty spots don't return
-    return None
+    try:
+        return formats.parse_text(text or '')
+    except ValueError as error:
+        print('No puzzle on the clipboard ({}).'.format(error))
+        return None
 
 
-def valid_number(board, number, position):
+def open_grid(start_board, backend='backtrack'):
     """
-    Returns if the attempted move is valid
-    input: board: 2d list of ints and empty character (could be 'X', 0, or whatever)
-    input: number: int of guess
-    input: position: tuple for spot in grid (row, column)
-    output: bool
+    Sizes the window for a board and makes its grid
+    input: start_board: Board, or None for the built in board
+    input: backend: solver engine (see backends.py)
+    output: Grid
     """
-    # Check row
-    for i in range(len(board[position[0]])):
-        #print(board[position[0]][i], end=' ')
-        if board[position[0]][i] == number and position[1] != i:
-            #print("Number in row.")
-            return False
-
-    # Check column
-    for j in range(len(board)):
-        #print(board[j][position[1]], end='\n')
-        if board[j][position[1]] == number and position[0] != j:
-            #print("Number in col.")
-            return False
-
-    # Check boxes
-    # 0,0 | 0,1 | 0,2
-    # ---------------
-    # 1,0 | 1,1 | 1,2
-    # ---------------
-    # 2,0 | 2,1 | 2,2
-
-    box_x = position[0] // 3
-    box_y = position[1] // 3
-
-    for i in range(box_x*3, box_x*3+3):
-        for j in range(box_y*3, box_y*3+3):
-            # # DEBUG
-            # print(i, j)
-            # print(board[i][j])
-            if board[i][j] == number and position[0] != i and position[1] !=j:
-                return False
+    import pygame
+
+    grid_size = len(start_board) if start_board is not None else len(Grid.board)
+    window_width = max(540, grid_size * 36)
+    window_height = window_width + 60
+
+    # Same window width for the grid but shorter height for base
+    win = pygame.display.set_mode((window_width, window_height))
+    return Grid(grid_size, grid_size, window_width, window_width, win, backend, start_board)
+
+
+@lru_cache(maxsize=None)
+def font(size):
+    """
+    input: int size of the font
+    output: pygame Font, made once per size
+    """
+    import pygame
+
+    return pygame.font.SysFont("comicsans", size)
 
-    return True
+
+@lru_cache(maxsize=None)
+def glyphs(size, colour, count):
+    """
+    Renders every symbol once, so drawing a square is just a blit
+    input: int size of the font
+    input: colour: RGB tuple
+    input: count: int biggest value on the board
+    output: list of pygame Surfaces, one per value (index 0 is blank)
+    """
+    fnt = font(size)
+    return [fnt.render(SYMBOLS[value], 1, colour) for value in range(count + 1)]
 
 
 def redraw_window(win, board, time, strikes):
     """
-    Updates the whole board in the game window
+    Draws the whole game window, later frames only need draw_status and board.draw
     input: win is pygame window for board
     input: board is the grid object
     input: total playtime from system
     input: strikes are the number of wrong clicks
     """
     win.fill((255,255,255))
+    draw_status(win, board, time, strikes)
+
+    # Draw grid and board
+    board.draw(full=True)
+
+
+def draw_status(win, board, time, strikes):
+    """
+    Draws the time and strikes under the grid
+    input: win, board, time, strikes: same as redraw_window
+    output: pygame Rect that was drawn over
+    """
+    import pygame
+
+    width, height = win.get_size()
+    top = board.background.get_height() if board.background is not None else int(board.height) + 3
+    rect = pygame.Rect(0, top, width, height - top)
+    win.fill((255,255,255), rect)
 
     # Draw time
-    fnt = pygame.font.SysFont("comicsans", 40)
+    fnt = font(40)
     text = fnt.render("Time - " + format_time(time), 1, (0,0,0))
-    win.blit(text, (540 - 200, 560))
+    win.blit(text, (width - 200, height - 40))
 
     # Draw strikes
     text = fnt.render("X " * strikes, 1, (255,0,0))
-    win.blit(text, (20, 560))
+    win.blit(text, (20, height - 40))
 
-    # Draw grid and board
-    board.draw()
+    return rect
 
 
 def format_time(time):
@@ -443,27 +742,60 @@ def format_time(time):
 
 # Main game
 def main():
-
-    title = 'Sudoku Game!'
-    window_width = 540
-    window_height = 600
-    grid_size = 9
-
-    # Initialize pygame window
-    win = pygame.display.set_mode((window_width, window_height))
-    pygame.display.set_caption(title)
-
-    # Initialize board with the same window width but shorter height for base
-    board = Grid(grid_size, grid_size, window_width, window_width, win)
+    import pygame
+    import store
+
+    parser = argparse.ArgumentParser(description='Play sudoku')
+    parser.add_argument('--backend', choices=backends.BACKENDS, default='backtrack',
+                        help='solver engine for checking moves and auto solving (default: backtrack)')
+    parser.add_argument('--difficulty', choices=store.DIFFICULTIES,
+                        help='play a random board of this difficulty from the puzzle store '
+                             '(default: the built in board)')
+    parser.add_argument('--remote', metavar='URL',
+                        help='get the board from a sugoku style server instead of the puzzle store')
+    parser.add_argument('--puzzle', metavar='TEXT',
+                        help='play this puzzle: 81 characters with 0 or . for empty, or 256 / 625 '
+                             'for a 16x16 / 25x25 board (A-P for 10-25)')
+    parser.add_argument('--load', metavar='FILE',
+                        help='play a puzzle from a puzzle file, in any format from formats.py '
+                             '(Ctrl+V in the game plays the one on the clipboard)')
+    parser.add_argument('--index', type=int, default=0,
+                        help='which puzzle of the --load file to play, counting from 0 (default: 0)')
+    parser.add_argument('--solve-speed', type=float, default=SOLVE_SPEED, metavar='STEPS',
+                        help='auto solve steps shown per second, 0 for as fast as possible '
+                             '(default: {})'.format(SOLVE_SPEED))
+    parser.add_argument('--frame-budget', type=int, default=FRAME_BUDGET, metavar='STEPS',
+                        help='most auto solve steps shown in one frame (default: {})'.format(FRAME_BUDGET))
+    args = parser.parse_args()
+
+    start_board = None
+    if args.puzzle:
+        start_board = batch.parse_line(args.puzzle.strip())
+    elif args.load:
+        start_board = formats.load(args.load, args.index)
+    elif args.difficulty or args.remote:
+        start_board = get_board(args.difficulty or 'easy', args.remote)
+
+    # Initialize pygame window and board
+    board = open_grid(start_board, args.backend)
+    win = board.win
+    pygame.display.set_caption('Sudoku Game!')
 
     key = None
     run = True
     start = time.time()
     strikes = 0
 
+    # Everything is drawn once, after that only what changed
+    clock = pygame.time.Clock()
+    redraw_window(win, board, 0, strikes)
+    pygame.display.update()
+    status = (0, strikes)
 
     # Gameplay
     while run:
+        clock.tick(FPS)
+        full = False
 
         # Elapsed time
         play_time = round(time.time() - start)
@@ -472,25 +804,50 @@ def main():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
+            if event.type == pygame.VIDEOEXPOSE:
+                full = True
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    key = 1
-                if event.key == pygame.K_2:
-                    key = 2
-                if event.key == pygame.K_3:
-                    key = 3
-                if event.key == pygame.K_4:
-                    key = 4
-                if event.key == pygame.K_5:
-                    key = 5
-                if event.key == pygame.K_6:
-                    key = 6
-                if event.key == pygame.K_7:
-                    key = 7
-                if event.key == pygame.K_8:
-                    key = 8
-                if event.key == pygame.K_9:
-                    key = 9
+                # Digits, and letters for the values above 9 on bigger boards
+                value = SYMBOLS.find(event.unicode.upper()) if event.unicode else -1
+                if 0 < value <= board.rows:
+                    key = value
+
+                if event.key == pygame.K_SPACE:
+                    if board.solving():
+                        board.finish_solve()
+                    else:
+                        print('\nI will solve the board for you, pitiful human.')
+                        board.start_solve(args.solve_speed, args.frame_budget)
+
+                if event.key == pygame.K_ESCAPE and board.solving():
+                    board.cancel_solve()
+
+                # No moves while the auto solve has the board
+                if board.solving():
+                    continue
+
+                if event.key == pygame.K_TAB:
+                    board.toggle_pencil()
+
+                # New game with the puzzle on the clipboard
+                if event.key == pygame.K_v and event.mod & pygame.KMOD_CTRL:
+                    pasted = paste_board()
+                    if pasted is not None:
+                        board = open_grid(pasted, args.backend)
+                        win = board.win
+                        key = None
+                        start = time.time()
+                        play_time = strikes = 0
+                        full = True
+                    continue
+
+                if event.unicode == '?':
+                    hint = board.hint()
+                    if hint is None:
+                        print('No square can be filled in by singles, it needs a guess.')
+                    else:
+                        key, reason = hint
+                        print('Hint: {} ({}).'.format(SYMBOLS[key], reason))
 
                 if event.key == pygame.K_BACKSPACE:
                     board.clear()
@@ -498,12 +855,13 @@ def main():
 
                 if event.key == pygame.K_RETURN:
                     i, j = board.selected
-                    if board.cubes[i][j].temp != 0:
-                        if not board.place(board.cubes[i][j].temp):
+                    guess = board.cubes[i][j].temp
+                    if guess != 0:
+                        if not board.place(guess):
                             #print('Correct number!')
                             #continue
                         #else:
-                            print(str(key) + ' is incorrect.')
+                            print(SYMBOLS[guess] + ' is incorrect.')
                             strikes += 1
                         key = None
 
@@ -513,11 +871,6 @@ def main():
                         print('Your final time was ' + format_time(play_time) + '.\n')
                         run = False
 
-                if event.key == pygame.K_SPACE:
-                    print('\nI will solve the board for you, pitiful human.')
-                    board.solve_board()
-                    print('\nYou\'re welcome.\n')
-
 
             # Select square
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -527,18 +880,40 @@ def main():
                     board.select(clicked[0], clicked[1])
                     key = None
 
+        # Show the auto solve steps due this frame
+        if board.solving():
+            solved = board.update_solve()
+            if solved:
+                print('\nYou\'re welcome.\n')
+            elif solved is not None:
+                print('\nThe board was left as it was.\n')
+
         # Draw temp value
         if board.selected and key != None:
             board.sketch(key)
 
         # Update window
-        redraw_window(win, board, play_time, strikes)
-        pygame.display.update()
+        if full:
+            redraw_window(win, board, play_time, strikes)
+            pygame.display.update()
+        else:
+            rects = board.draw()
+            if (play_time, strikes) != status:
+                rects.append(draw_status(win, board, play_time, strikes))
+            if rects:
+                pygame.display.update(rects)
+        status = (play_time, strikes)
+
 
 
 
 
+# Play (guarded so the grid can be imported without opening a window)
+if __name__ == '__main__':
+    import pygame
 
-# Play
-main()
-pygame.quit()
+    pygame.font.init()
+    try:
+        main()
+    finally:
+        pygame.quit()
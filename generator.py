@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Sudoku puzzle generator with difficulty grading
+"""
+
+"""
+Making a puzzle:
+1. Fill the three boxes on the diagonal with random digits (they don't share any
+    row, column or box, so anything goes) and solve the rest to get a full grid.
+2. Go through the squares in random order (in pairs mirrored through the center,
+    like printed puzzles) and take the clues out again, as long as the puzzle still
+    has only one solution and doesn't get harder than asked for.
+3. Grade the result and start over if it came out easier than asked for.
+
+Grading goes by what it takes to solve the puzzle with the rules in logic.py:
+    easy: naked and hidden singles are enough
+    medium: also needs pairs/triples or pointing/box-line reductions
+    hard: logic gets stuck and the solver has to guess (nodes = guesses made)
+
+generate_many spreads the work over worker processes to build big pools offline:
+    python generator.py --difficulty hard --count 10000 --output hard.txt
+"""
+
+import argparse
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import formats
+import logic
+from batch import format_board
+from bitmask import BitBoard
+from board import Board, copy_board
+from store import DIFFICULTIES
+
+EMPTY = 0
+SIZE = 9
+BOX = 3
+
+# Full grids tried per puzzle before giving up on a difficulty
+MAX_ATTEMPTS = 100
+
+
+def full_grid(rng):
+    """
+    input: rng: random.Random
+    output: 2d list of ints for a random solved board
+    """
+    board = [[EMPTY] * SIZE for _ in range(SIZE)]
+    for box in range(BOX):
+        digits = rng.sample(range(1, SIZE + 1), SIZE)
+        for k in range(SIZE):
+            board[box * BOX + k // BOX][box * BOX + k % BOX] = digits[k]
+
+    logic.solve(board)
+    return board
+
+
+def level(board):
+    """
+    Which of the difficulties the logic needs to solve a board
+    input: board: 2d list of ints (or a Board), not changed
+    output: int index into DIFFICULTIES (2 if logic alone can't finish it)
+    """
+    state = BitBoard(Board(board))
+    if not state.consistent:
+        return len(DIFFICULTIES) - 1
+
+    trail = []
+    for index, advanced in enumerate((False, True)):
+        if logic.propagate(state, trail, advanced) is None:
+            break
+        if not state.empties():
+            return index
+
+    return len(DIFFICULTIES) - 1
+
+
+def grade(board):
+    """
+    input: board: 2d list of ints (or a Board), not changed
+    output: tuple (string difficulty, int guesses the solver needed)
+    """
+    return DIFFICULTIES[level(board)], logic.run(copy_board(board)).nodes
+
+
+def generate(difficulty='medium', rng=None, symmetric=True):
+    """
+    Makes one puzzle with a unique solution
+    input: difficulty: one of DIFFICULTIES
+    input: rng: random.Random (default: a new unseeded one)
+    input: symmetric: bool for removing clues in pairs mirrored through the center
+    output: tuple (Board puzzle, Board solution), or None if nothing fit in MAX_ATTEMPTS
+    """
+    if difficulty not in DIFFICULTIES:
+        raise ValueError("Unknown difficulty '{}', expected one of {}".format(difficulty, DIFFICULTIES))
+
+    rng = rng or random.Random()
+    target = DIFFICULTIES.index(difficulty)
+
+    for _ in range(MAX_ATTEMPTS):
+        solution = full_grid(rng)
+        puzzle = copy_board(solution)
+
+        cells = [(i, j) for i in range(SIZE) for j in range(SIZE)]
+        rng.shuffle(cells)
+        for i, j in cells:
+            if puzzle[i][j] == EMPTY:
+                continue
+
+            removed = [(i, j)]
+            if symmetric and (SIZE - 1 - i, SIZE - 1 - j) != (i, j):
+                removed.append((SIZE - 1 - i, SIZE - 1 - j))
+            values = [puzzle[r][c] for r, c in removed]
+            for r, c in removed:
+                puzzle[r][c] = EMPTY
+
+            # Solvable by logic alone means the solution is unique as well
+            needed = level(puzzle)
+            if needed > target or (needed == len(DIFFICULTIES) - 1 and not logic.has_unique_solution(puzzle)):
+                for (r, c), value in zip(removed, values):
+                    puzzle[r][c] = value
+
+        if level(puzzle) == target:
+            return Board(puzzle), Board(solution)
+
+    return None
+
+
+def generate_seeded(difficulty, seed, symmetric=True):
+    """
+    Runs in a worker process
+    output: tuple (Board puzzle, Board solution) or None, same for the same seed
+    """
+    return generate(difficulty, random.Random(seed), symmetric)
+
+
+def generate_many(count, difficulty='medium', workers=None, seed=None, symmetric=True):
+    """
+    Makes many puzzles in parallel worker processes
+    input: count: int number of puzzles
+    input: difficulty: one of DIFFICULTIES
+    input: workers: int number of processes (default: one per cpu core)
+    input: seed: int for a repeatable set of puzzles, or None
+    input: symmetric: bool, same as generate
+    output: generator of (Board puzzle, Board solution) tuples
+    """
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    seeds = range(seed, seed + count)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(generate_seeded, [difficulty] * count, seeds, [symmetric] * count,
+                               chunksize=max(1, min(64, count // (workers * 4))))
+        for result in results:
+            if result is not None:
+                yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate sudoku puzzles with a unique solution')
+    parser.add_argument('--difficulty', choices=DIFFICULTIES, default='medium')
+    parser.add_argument('--count', type=int, default=1, help='number of puzzles (default: 1)')
+    parser.add_argument('--output', metavar='FILE', help='write puzzles here, one per line (default: print them)')
+    parser.add_argument('--format', choices=formats.FORMATS,
+                        help='format of the puzzles written, jsonl adds the difficulty and solution '
+                             '(default: from the --output extension, see formats.py)')
+    parser.add_argument('--workers', type=int, default=0, help='processes to use, 0 for one per cpu core')
+    parser.add_argument('--seed', type=int, help='seed for a repeatable set of puzzles')
+    args = parser.parse_args()
+
+    if args.output:
+        output, fmt = formats.open_puzzles(args.output, 'w', args.format)
+    else:
+        fmt = args.format or 'line'
+        output = sys.stdout.buffer if formats.MODES[fmt] == 'b' else sys.stdout
+
+    puzzles = generate_many(args.count, args.difficulty, args.workers, args.seed)
+    try:
+        if fmt == 'jsonl':
+            formats.write_records(output, ((puzzle, {'difficulty': args.difficulty, 'solution': format_board(solution)})
+                                           for puzzle, solution in puzzles))
+        else:
+            formats.write_puzzles(output, (puzzle for puzzle, solution in puzzles), fmt)
+    finally:
+        if output not in (sys.stdout, sys.stdout.buffer):
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
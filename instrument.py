@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+"""
+Counting and tracing what the solver engines do
+"""
+
+"""
+The engines only collect anything when handed a Stats object: run() then builds a
+traced state (TracedBitBoard or TracedLinks) whose methods count every step and pass
+it on to an optional hook. Without a Stats object the plain classes are used, so an
+untraced solve runs exactly the same code as before.
+
+What gets counted:
+    nodes           digits the search tried (guesses)
+    backtracks      guesses taken back again
+    max_depth       most guesses stacked up at once
+    checks          candidate / valid number checks (the bitmask engines only)
+    placed/removed  digits filled in and taken back by the logic rules (logic only)
+    propagate_time  seconds spent in the logic rules
+    search_time     seconds spent everywhere else
+
+The hook is called as hook(event, number, position) for every step, with event one of
+'guess', 'backtrack', 'place' (filled in by logic) or 'remove' (logic undone), e.g.
+to drive an animation or log a pathological puzzle:
+
+    stats = instrument.profile(board, hook=lambda *step: print(*step))
+
+A Stats object can also stop the solve, checked before every guess and every round
+of logic: after timeout seconds, after max_nodes guesses, or once its CancelToken is
+cancelled (from any thread). The solve then gives up, the board is put back the way
+it was, and stats.gave_up says why ('timeout', 'node budget' or 'cancelled') with the
+counts up to that point:
+
+    stats = instrument.profile(board, timeout=0.05)
+    if stats.gave_up:
+        ...
+"""
+
+import threading
+import time
+
+import backends
+from bitmask import BitBoard
+from board import copy_board
+from dlx import DancingLinks
+
+
+class GaveUp(Exception):
+    """
+    Raised inside a solve to stop it when a limit is hit
+    """
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Lets another thread (or a hook) stop a solve at its next guess
+    """
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+
+class Stats:
+    """
+    Counters for one solve, filled in by the traced states
+    """
+    def __init__(self, hook=None, timeout=None, max_nodes=None, cancel=None):
+        """
+        input: hook: function called as hook(event, number, position) on every step, or None
+        input: timeout: float seconds from now to give up after, or None
+        input: max_nodes: int most guesses to make before giving up, or None
+        input: cancel: CancelToken to give up on, or None
+        """
+        self.hook = hook
+        self.deadline = None if timeout is None else time.perf_counter() + timeout
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+        self.limited = timeout is not None or max_nodes is not None or cancel is not None
+        self.gave_up = None
+        self.nodes = 0
+        self.backtracks = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.checks = 0
+        self.placed = 0
+        self.removed = 0
+        self.propagate_time = 0.0
+        self.search_time = 0.0
+        self.solved = False
+
+    def check(self):
+        """
+        Raises GaveUp if the solve was cancelled or ran out of time
+        """
+        if self.cancel is not None and self.cancel.cancelled:
+            raise GaveUp('cancelled')
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise GaveUp('timeout')
+
+    def guess(self, number, position):
+        """
+        Counts a guess, called before it is made so it can still give up: the budget
+        allows max_nodes guesses and the one after them gives up
+        """
+        if self.limited:
+            if self.max_nodes is not None and self.nodes >= self.max_nodes:
+                raise GaveUp('node budget')
+            self.check()
+
+        self.nodes += 1
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+        if self.hook is not None:
+            self.hook('guess', number, position)
+
+    def backtrack(self, number, position):
+        self.backtracks += 1
+        self.depth -= 1
+        if self.hook is not None:
+            self.hook('backtrack', number, position)
+
+    def place(self, number, position):
+        self.placed += 1
+        if self.hook is not None:
+            self.hook('place', number, position)
+
+    def remove(self, number, position):
+        self.removed += 1
+        if self.hook is not None:
+            self.hook('remove', number, position)
+
+    def propagating(self, function, *args):
+        """
+        Calls function(*args), adding the time it takes to propagate_time
+        output: whatever function returns
+        """
+        if self.limited:
+            self.check()
+
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.propagate_time += time.perf_counter() - start
+
+    def as_dict(self):
+        """
+        output: dict of the counters, timings and outcome
+        """
+        return {key: getattr(self, key) for key in (
+            'nodes', 'backtracks', 'max_depth', 'checks', 'placed', 'removed',
+            'propagate_time', 'search_time', 'solved', 'gave_up')}
+
+
+class TracedBitBoard(BitBoard):
+    """
+    BitBoard reporting every check, placement and removal to a Stats object
+    """
+    def __init__(self, board, stats):
+        # stats is still None (the class default) while the starting numbers go in
+        super().__init__(board)
+        self.stats = stats
+
+    def candidates(self, position):
+        if self.stats is not None:
+            self.stats.checks += 1
+        return BitBoard.candidates(self, position)
+
+    def place(self, number, position):
+        BitBoard.place(self, number, position)
+        if self.stats is not None:
+            self.stats.place(number, position)
+
+    def remove(self, number, position):
+        BitBoard.remove(self, number, position)
+        self.stats.remove(number, position)
+
+    def guess(self, number, position):
+        # Counted first, so a guess over the budget is never placed
+        self.stats.guess(number, position)
+        BitBoard.place(self, number, position)
+        self.nodes += 1
+
+    def backtrack(self, number, position):
+        BitBoard.remove(self, number, position)
+        self.stats.backtrack(number, position)
+
+
+class TracedLinks(DancingLinks):
+    """
+    DancingLinks reporting every row the search selects and deselects to a Stats object
+    (run sets stats after the starting numbers are selected)
+    """
+    def select(self, node):
+        # Counted first like TracedBitBoard.guess
+        if self.stats is not None:
+            i, j, number = self.choice[node]
+            self.stats.guess(number, (i, j))
+        DancingLinks.select(self, node)
+
+    def deselect(self, node):
+        DancingLinks.deselect(self, node)
+        i, j, number = self.choice[node]
+        self.stats.backtrack(number, (i, j))
+
+
+def profile(board, backend='backtrack', strategy='logic', lcv=False, hook=None, timeout=None, max_nodes=None,
+            cancel=None):
+    """
+    Solves a board in place while counting everything the engine does
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares
+    input: backend, strategy, lcv: same as backends.solve
+    input: hook: function called as hook(event, number, position) on every step, or None
+    input: timeout, max_nodes, cancel: when to give up, see Stats
+    output: Stats (see its solved, and gave_up if it stopped early)
+    """
+    stats = Stats(hook, timeout, max_nodes, cancel)
+    original = copy_board(board) if stats.limited else None
+
+    start = time.perf_counter()
+    try:
+        stats.solved = backends.solve(board, backend, strategy, lcv, stats)
+    except GaveUp as error:
+        stats.gave_up = error.reason
+        for i in range(len(board)):
+            board[i][:] = original[i]
+    stats.search_time = time.perf_counter() - start - stats.propagate_time
+
+    return stats
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+"""
+Backtracking solver with its own stack instead of recursion
+"""
+
+"""
+The recursive searches in bitmask.py and logic.py use one Python call per guess,
+which costs a stack frame every step and stops at the recursion limit on big boards.
+Search keeps the whole search in a few lists made up front, one slot per empty square:
+
+    empties[d]  the square filled at depth d (mrv swaps the best one in, like search_mrv)
+    picked[d]   where that square was swapped in from, to swap it back when done
+    options[d]  candidate digits at depth d not tried yet
+    numbers[d]  the digit currently placed at depth d
+
+Going deeper fills the next slot, backtracking just steps back one slot and removes
+that digit, so nothing is ever allocated while searching.
+
+'reading' and 'mrv' only guess, with no logic in between, which is fine for 9x9 boards
+but can take minutes on a 16x16 and far longer on a 25x25. Strategy 'logic' runs the
+rules of logic.py before every guess like logic.search does, with the digits they
+place kept on one trail per depth:
+
+    trails[d]     what the rules placed after the guess at depth d - 1 (the start at 0)
+    positions[d]  the square guessed at depth d, the most constrained one left
+
+and backtracking out of a depth takes its trail back first. It makes the same guesses
+as logic.run, so it is the one to use for anything bigger than 9x9.
+
+All the search state lives in those lists and the current depth, so the search can
+stop after any number of steps and be picked up again later, e.g. a few hundred
+steps per frame of the game, or one guess/backtrack at a time with steps():
+
+    search = Search(board)
+    while search.advance(500) is None:
+        draw()
+"""
+
+import logic
+from bitmask import new_state
+from board import Board
+
+# 'reading' and 'mrv' as in bitmask.py, or 'logic' (see the top of the file)
+STRATEGIES = ('reading', 'mrv', 'logic')
+
+
+class Search:
+    """
+    One pausable search over a board. The board is filled in place as it goes.
+    """
+    def __init__(self, board, strategy='mrv', stats=None):
+        """
+        input: board: 2d list of ints (or a Board) with 0 for the empty squares
+        input: strategy: 'reading' to fill squares L->R, Top->Bot, 'mrv' to always fill
+            the square with the fewest candidates left (ties go to the most empty peers)
+            or 'logic' to also run the rules of logic.py before each guess. With 'logic' a
+            2d list board is only filled in once the search is done.
+        input: stats: instrument.Stats to count the search in, or None
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError("Unknown strategy '{}', expected one of {}".format(strategy, STRATEGIES))
+
+        # The rules work on the flat cells of a Board, a 2d list is copied out at the end
+        self.board = board
+        if strategy == 'logic' and not isinstance(board, Board):
+            board = Board(board)
+        self.work = board
+
+        self.state = new_state(board, stats)
+        self.strategy = strategy
+        self.empties = self.state.empties()
+        slots = len(self.empties) + 1
+        self.picked = list(range(slots))
+        self.options = [0] * slots
+        self.numbers = [0] * slots
+        self.trails = [[] for _ in range(slots)] if strategy == 'logic' else None
+        self.positions = [None] * slots if strategy == 'logic' else None
+
+        # Last step taken, as (event, number, position) with event 'guess' or 'backtrack'
+        self.last = None
+
+        self.depth = 0
+        self.done = not self.state.consistent or not self.empties
+        if self.done:
+            self.state.solved = self.state.consistent
+            self.copy_out()
+        elif strategy == 'logic':
+            self.propagate(0)
+        else:
+            self.options[0] = self.choose(0)
+
+    def __iter__(self):
+        return self.steps()
+
+    def steps(self):
+        """
+        Runs the search one step at a time
+        output: generator of (event, number, position) tuples, event 'guess' or 'backtrack'
+        """
+        while not self.done:
+            self.advance(1)
+            if self.last is not None:
+                yield self.last
+
+    def finish(self):
+        """
+        Runs the rest of the search
+        output: bool for whether a solution was found
+        """
+        return self.advance(-1)
+
+    def choose(self, depth):
+        """
+        Picks the square for a depth and moves it to empties[depth]
+        output: int mask of its candidates
+        """
+        state = self.state
+        empties = self.empties
+        if self.strategy == 'reading':
+            return state.candidates(empties[depth])
+
+        best = depth
+        best_count = state.size + 1
+        best_degree = -1
+        for k in range(depth, len(empties)):
+            count = state.candidates(empties[k]).bit_count()
+            if count > best_count:
+                continue
+            if count <= 1:
+                best = k
+                break
+
+            degree = state.degree(empties[k])
+            if count < best_count or degree > best_degree:
+                best, best_count, best_degree = k, count, degree
+
+        empties[depth], empties[best] = empties[best], empties[depth]
+        self.picked[depth] = best
+        return state.candidates(empties[depth])
+
+    def propagate(self, depth):
+        """
+        Runs the rules of logic.py for a depth ('logic' only) and picks the square to guess
+        there, or finishes the search when they fill the board. On a contradiction the
+        depth is left with nothing to try, so the next step backtracks out of it.
+        """
+        state = self.state
+        trail = self.trails[depth]
+        if state.stats is None:
+            candidates = logic.propagate(state, trail)
+        else:
+            candidates = state.stats.propagating(logic.propagate, state, trail)
+        if candidates is None:
+            logic.undo(state, trail)
+            self.options[depth] = 0
+            return
+
+        cell = logic.most_constrained(state, candidates)
+        if cell is None:
+            state.solved = True
+            self.done = True
+            self.copy_out()
+            return
+
+        self.positions[depth] = state.layout.positions[cell]
+        self.options[depth] = candidates[cell]
+
+    def copy_out(self):
+        """
+        Copies the board searched back into a 2d list board ('logic' only)
+        """
+        if self.work is not self.board:
+            for i, row in enumerate(self.work.tolist()):
+                self.board[i][:] = row
+
+    def advance(self, count):
+        """
+        Runs up to count more steps (guesses or backtracks), then pauses
+        input: count: int, or -1 for no limit
+        output: None if the search isn't done yet, else bool for whether it found a solution
+        """
+        state = self.state
+        if self.done:
+            return state.solved
+        if self.strategy == 'logic':
+            return self.advance_logic(count)
+
+        empties, picked, options, numbers = self.empties, self.picked, self.options, self.numbers
+        last = len(empties)
+        choose = self.choose
+        candidates = state.candidates
+        reading = self.strategy == 'reading'
+
+        depth = self.depth
+        event = None
+        while count:
+            count -= 1
+
+            free = options[depth]
+            if free:
+                bit = free & -free
+                options[depth] = free ^ bit
+                number = bit.bit_length() - 1
+                position = empties[depth]
+
+                state.guess(number, position)
+                numbers[depth] = number
+                event = 'guess'
+                depth += 1
+                if depth == last:
+                    state.solved = True
+                    self.done = True
+                    break
+
+                options[depth] = candidates(empties[depth]) if reading else choose(depth)
+            else:
+                # Every digit failed here: put the square back and take back the guess above
+                best = picked[depth]
+                empties[depth], empties[best] = empties[best], empties[depth]
+                depth -= 1
+                if depth < 0:
+                    event = None
+                    self.done = True
+                    break
+
+                number = numbers[depth]
+                position = empties[depth]
+                state.backtrack(number, position)
+                event = 'backtrack'
+
+        self.depth = depth
+        self.last = None if event is None else (event, number, position)
+        return state.solved if self.done else None
+
+    def advance_logic(self, count):
+        """
+        Same as advance for strategy 'logic'
+        """
+        state = self.state
+        options, numbers, trails, positions = self.options, self.numbers, self.trails, self.positions
+
+        depth = self.depth
+        event = None
+        while count:
+            count -= 1
+
+            free = options[depth]
+            if free:
+                bit = free & -free
+                options[depth] = free ^ bit
+                number = bit.bit_length() - 1
+                position = positions[depth]
+
+                state.guess(number, position)
+                numbers[depth] = number
+                event = 'guess'
+                depth += 1
+                self.propagate(depth)
+                if self.done:
+                    break
+            else:
+                # Every digit failed here: take back what the rules placed, then the guess above
+                logic.undo(state, trails[depth])
+                depth -= 1
+                if depth < 0:
+                    event = None
+                    self.done = True
+                    self.copy_out()
+                    break
+
+                number = numbers[depth]
+                position = positions[depth]
+                state.backtrack(number, position)
+                event = 'backtrack'
+
+        self.depth = depth
+        self.last = None if event is None else (event, number, position)
+        return state.solved if self.done else None
+
+
+def solve(board, strategy='mrv'):
+    """
+    Solves a sudoku board in place without recursion
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares
+    input: strategy: one of STRATEGIES, see Search
+    output: bool for whether a solution was found
+    """
+    return run(board, strategy).solved
+
+
+def run(board, strategy='mrv', stats=None):
+    """
+    Solves a sudoku board in place and keeps the state for inspection
+    input: board, strategy: same as solve
+    input: stats: instrument.Stats to count the search in, or None
+    output: BitBoard used for the search (see its solved and nodes)
+    """
+    search = Search(board, strategy, stats)
+    search.finish()
+    return search.state
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+
+"""
+Constraint propagation for the sudoku solver
+"""
+
+"""
+Before guessing, fill in everything that plain logic can prove, the same way a
+person would. Each step works on the candidate masks of the empty squares
+(bit d set if the digit d could still go there) and is repeated until nothing
+changes:
+
+1. Naked single: a square with only one candidate gets that digit.
+2. Hidden single: a digit that fits in only one square of a row, column or box
+    goes there.
+3. Naked pairs/triples: if 2 (or 3) squares of a unit only allow the same 2 (or 3)
+    digits between them, no other square in the unit can have those digits.
+4. Hidden pairs/triples: if 2 (or 3) digits only fit in the same 2 (or 3) squares of
+    a unit, those squares can't have any other digit.
+5. Pointing / box-line: if a digit in a box only fits in one row or column, it can't
+    go anywhere else in that row or column (and the same the other way round).
+
+Only once all of that is stuck does the search guess, picking the square with the
+fewest candidates left. After each guess the rules run again. Everything filled in
+by logic is recorded on a trail so it can be undone when a guess turns out wrong.
+"""
+
+from functools import lru_cache
+from itertools import combinations
+
+from bitmask import EMPTY, BitBoard, digits, layout, new_state
+from board import Board
+
+# Largest naked/hidden subset looked for
+MAX_SUBSET = 3
+
+
+@lru_cache(maxsize=None)
+def crossings(size):
+    """
+    input: size: int rows of the board
+    output: list of each box/line crossing as (squares in both, rest of the box, rest of the line),
+        as tuples of flat square numbers
+    """
+    units = layout(size).unit_cells
+    return [(tuple(cell for cell in line if cell in box),
+             tuple(cell for cell in box if cell not in line),
+             tuple(cell for cell in line if cell not in box))
+            for box in units[2 * size:] for line in units[:2 * size]
+            if any(cell in box for cell in line)]
+
+
+def solve(board):
+    """
+    Solves a sudoku board in place, using logic first and only guessing when stuck
+    input: board: 2d list of ints with 0 for the empty squares
+    output: bool for whether a solution was found
+    """
+    return run(board).solved
+
+
+def run(board, stats=None):
+    """
+    Solves a sudoku board in place and keeps the state for inspection
+    input: board: 2d list of ints with 0 for the empty squares
+    input: stats: instrument.Stats to count the search in, or None to run untraced
+    output: BitBoard used for the search (its nodes are the guesses made)
+    """
+    # The rules work on the flat cells of a Board, a 2d list is copied in and out
+    work = board if isinstance(board, Board) else Board(board)
+    state = new_state(work, stats)
+    if state.consistent:
+        state.solved = search(state)
+
+    if work is not board:
+        for i, row in enumerate(work.tolist()):
+            board[i][:] = row
+
+    return state
+
+
+def search(state):
+    """
+    Propagates, then branches on the empty square with the fewest candidates
+    input: state: BitBoard for the board being solved
+    output: bool for whether the rest of the board could be filled
+    """
+    trail = []
+    if state.stats is None:
+        candidates = propagate(state, trail)
+    else:
+        candidates = state.stats.propagating(propagate, state, trail)
+    if candidates is None:
+        undo(state, trail)
+        return False
+
+    cell = most_constrained(state, candidates)
+    if cell is None:
+        return True
+
+    position = state.layout.positions[cell]
+    for number in digits(candidates[cell]):
+        state.guess(number, position)
+
+        # Recursive check
+        if search(state):
+            return True
+
+        state.backtrack(number, position)
+
+    undo(state, trail)
+    return False
+
+
+def count_solutions(board, limit=2):
+    """
+    Counts the solutions of a board, stopping as soon as limit of them are found
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares, not changed
+    input: limit: int, the most solutions to look for
+    output: int number of solutions found (at most limit)
+    """
+    state = BitBoard(Board(board))
+    if not state.consistent:
+        return 0
+
+    return count(state, limit)
+
+
+def has_unique_solution(board):
+    """
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares, not changed
+    output: bool for whether the board has exactly one solution
+    """
+    return count_solutions(board, 2) == 1
+
+
+def count(state, limit):
+    """
+    Like search, but keeps going after a solution until limit are found and then
+    undoes everything it placed
+    input: state: BitBoard for the board being counted
+    input: limit: int, the most solutions to look for
+    output: int number of solutions found (at most limit)
+    """
+    trail = []
+    if state.stats is None:
+        candidates = propagate(state, trail)
+    else:
+        candidates = state.stats.propagating(propagate, state, trail)
+    if candidates is None:
+        undo(state, trail)
+        return 0
+
+    cell = most_constrained(state, candidates)
+    if cell is None:
+        undo(state, trail)
+        return 1
+
+    position = state.layout.positions[cell]
+    found = 0
+    for number in digits(candidates[cell]):
+        state.guess(number, position)
+        found += count(state, limit - found)
+        state.backtrack(number, position)
+
+        if found >= limit:
+            break
+
+    undo(state, trail)
+    return found
+
+
+def most_constrained(state, candidates):
+    """
+    input: state: BitBoard
+    input: candidates: list of candidate masks from propagate
+    output: int square number of the empty square with the fewest candidates, or None
+        when the board is full
+    """
+    cell = None
+    best = state.size + 1
+    for k, value in enumerate(state.board.cells):
+        if value == EMPTY:
+            options = candidates[k].bit_count()
+            if options < best:
+                cell, best = k, options
+
+    return cell
+
+
+def undo(state, trail):
+    """
+    Takes back everything propagate placed
+    input: state: BitBoard
+    input: trail: list of (number, position) in the order they were placed
+    """
+    while trail:
+        number, position = trail.pop()
+        state.remove(number, position)
+
+
+def propagate(state, trail, advanced=True):
+    """
+    Applies the rules until nothing changes. Placed digits go through state.place and
+    are appended to trail.
+    input: state: BitBoard over a Board
+    input: trail: list to record (number, position) of each digit placed
+    input: advanced: bool, False only uses the singles (rules 1 and 2)
+    output: list of candidate masks by square number (0 for filled squares), or None if
+        the board can't be solved from here
+    """
+    candidates = masks(state)
+
+    while True:
+        progress = singles(state, candidates, trail)
+        if progress is None:
+            return None
+        if progress:
+            continue
+
+        if not (advanced and (subsets(state, candidates) or intersections(state, candidates))):
+            return candidates
+
+
+def masks(state):
+    """
+    input: state: BitBoard over a Board
+    output: list of the candidate masks by square number (0 for filled squares)
+    """
+    rows, columns, boxes = state.rows, state.columns, state.boxes
+    free = state.all_digits
+    shape = state.layout
+    return [0 if value != EMPTY else free & ~(rows[i] | columns[j] | boxes[b])
+            for value, (i, j), b in zip(state.board.cells, shape.positions, shape.box_index)]
+
+
+def assign(state, candidates, trail, number, cell):
+    """
+    Places a digit proven by logic and removes it from the candidates of its peers
+    input: cell: int square number
+    output: bool, False if the digit is already used in a unit of the square
+    """
+    position = state.layout.positions[cell]
+    if not state.valid_number(number, position):
+        return False
+
+    state.place(number, position)
+    trail.append((number, position))
+
+    candidates[cell] = 0
+    clear = ~(1 << number)
+    for peer in state.layout.peers_of[cell]:
+        candidates[peer] &= clear
+
+    return True
+
+
+def singles(state, candidates, trail):
+    """
+    Places every naked and hidden single found in one pass
+    output: bool for whether anything was placed, or None on a contradiction
+    """
+    cells = state.board.cells
+    placed = False
+
+    # Naked singles
+    for k, mask in enumerate(candidates):
+        if cells[k] != EMPTY:
+            continue
+
+        if mask == 0:
+            return None
+        if mask & (mask - 1) == 0:
+            if not assign(state, candidates, trail, mask.bit_length() - 1, k):
+                return None
+            placed = True
+
+    # Hidden singles
+    for unit in state.layout.unit_cells:
+        once = 0
+        twice = 0
+        used = 0
+        for k in unit:
+            if cells[k] != EMPTY:
+                used |= 1 << cells[k]
+            else:
+                mask = candidates[k]
+                twice |= once & mask
+                once |= mask
+
+        # A missing digit with nowhere to go
+        if state.all_digits & ~used & ~once:
+            return None
+
+        for number in digits(once & ~twice):
+            bit = 1 << number
+            for k in unit:
+                if candidates[k] & bit:
+                    if not assign(state, candidates, trail, number, k):
+                        return None
+                    placed = True
+                    break
+
+    return placed
+
+
+def subsets(state, candidates):
+    """
+    Naked and hidden pairs/triples in every unit
+    output: bool for whether any candidate was removed
+    """
+    values = state.board.cells
+    changed = False
+
+    for unit in state.layout.unit_cells:
+        cells = [k for k in unit if values[k] == EMPTY]
+
+        for size in range(2, MAX_SUBSET + 1):
+            if len(cells) <= size:
+                break
+
+            # Naked: size squares sharing only size digits
+            small = [k for k in cells if candidates[k].bit_count() <= size]
+            for group in combinations(small, size):
+                union = 0
+                for k in group:
+                    union |= candidates[k]
+                if union.bit_count() != size:
+                    continue
+
+                for k in cells:
+                    if k not in group and candidates[k] & union:
+                        candidates[k] &= ~union
+                        changed = True
+
+            # Hidden: size digits only fitting in the same size squares
+            places = {}
+            for number in range(1, state.size + 1):
+                bit = 1 << number
+                spots = [k for k in cells if candidates[k] & bit]
+                if 2 <= len(spots) <= size:
+                    places[number] = spots
+
+            for group in combinations(places, size):
+                spots = set()
+                for number in group:
+                    spots.update(places[number])
+                if len(spots) != size:
+                    continue
+
+                keep = sum(1 << number for number in group)
+                for k in spots:
+                    if candidates[k] & ~keep:
+                        candidates[k] &= keep
+                        changed = True
+
+    return changed
+
+
+def intersections(state, candidates):
+    """
+    Pointing (box -> row/column) and box-line (row/column -> box) reductions
+    output: bool for whether any candidate was removed
+    """
+    changed = False
+
+    for inside, box_rest, line_rest in crossings(state.size):
+        shared = 0
+        for k in inside:
+            shared |= candidates[k]
+
+        box_only = 0
+        for k in box_rest:
+            box_only |= candidates[k]
+        line_only = 0
+        for k in line_rest:
+            line_only |= candidates[k]
+
+        # Digits the box only has in this line leave the rest of the line,
+        # and digits the line only has in this box leave the rest of the box
+        for mask, rest in ((shared & ~box_only, line_rest), (shared & ~line_only, box_rest)):
+            if not mask:
+                continue
+            for k in rest:
+                if candidates[k] & mask:
+                    candidates[k] &= ~mask
+                    changed = True
+
+    return changed
+
+
+def next_step(state, candidates=None):
+    """
+    Finds one square that rule 1 or 2 can fill in, without changing anything (for hints)
+    input: state: BitBoard over a Board
+    input: candidates: list of candidate masks by square number (0 for filled squares), or
+        None to work them out
+    output: (number, position, reason) with reason a string saying which rule applies,
+        or None if neither rule does
+    """
+    shape = state.layout
+    if candidates is None:
+        candidates = masks(state)
+
+    # Naked single
+    for k, mask in enumerate(candidates):
+        if mask and mask & (mask - 1) == 0:
+            return mask.bit_length() - 1, shape.positions[k], 'the only digit left for this square'
+
+    # Hidden single, units are the rows, then the columns, then the boxes
+    for index, unit in enumerate(shape.unit_cells):
+        once = 0
+        twice = 0
+        for k in unit:
+            mask = candidates[k]
+            twice |= once & mask
+            once |= mask
+
+        for number in digits(once & ~twice):
+            bit = 1 << number
+            for k in unit:
+                if candidates[k] & bit:
+                    kind = ('row', 'column', 'box')[index // state.size]
+                    return number, shape.positions[k], 'the only place for it in its ' + kind
+
+    return None
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+"""
+Solving many sudoku boards at once across all cpu cores
+"""
+
+"""
+Solving is plain CPU bound Python, so one process only ever uses one core.
+solve_many hands the boards out to a ProcessPoolExecutor:
+
+1. Boards are grouped into chunks so each trip to a worker process carries enough
+    work to be worth the pickling.
+2. Only a few chunks per worker are in flight at a time, so a generator of millions
+    of boards is never read into memory all at once.
+3. Results come back in the same order as the boards (ordered=True) or as soon as
+    each chunk is done (ordered=False).
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import backends
+import instrument
+
+# Chunks waiting or running per worker process
+IN_FLIGHT = 2
+
+
+def solve_chunk(boards, backend='backtrack', timeout=None, max_nodes=None):
+    """
+    Runs in a worker process
+    input: boards: list of boards
+    input: backend: solver engine (see backends.py)
+    input: timeout, max_nodes: per board limits to give up after (see instrument.py), or None
+    output: list of (board, bool solved) tuples
+    """
+    if timeout is None and max_nodes is None:
+        return [(board, backends.solve(board, backend)) for board in boards]
+
+    return [(board, instrument.profile(board, backend, timeout=timeout, max_nodes=max_nodes).solved)
+            for board in boards]
+
+
+def chunks(boards, size):
+    """
+    input: boards: iterable of boards
+    input: size: int number of boards per chunk
+    output: generator of lists of up to size boards
+    """
+    boards = iter(boards)
+    while True:
+        chunk = list(islice(boards, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def solve_many(boards, workers=None, chunksize=64, ordered=True, backend='backtrack', timeout=None, max_nodes=None):
+    """
+    Solves boards in parallel worker processes
+    input: boards: iterable of boards (2d lists of ints, 0 for empty)
+    input: workers: int number of processes (default: one per cpu core)
+    input: chunksize: int number of boards sent to a worker at a time
+    input: ordered: bool, False yields results as soon as they are done
+    input: backend: solver engine (see backends.py)
+    input: timeout, max_nodes: per board limits, same as solve_chunk
+    output: generator of (board, bool solved) tuples with the solved copies of the boards
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = chunks(boards, chunksize)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = deque()
+        for chunk in islice(pending, workers * IN_FLIGHT):
+            running.append(executor.submit(solve_chunk, chunk, backend, timeout, max_nodes))
+
+        while running:
+            if ordered:
+                done = [running.popleft()]
+            else:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                done = [future for future in running if future in finished]
+                for future in done:
+                    running.remove(future)
+
+            for future in done:
+                # Keep the workers busy before handing results back
+                for chunk in islice(pending, 1):
+                    running.append(executor.submit(solve_chunk, chunk, backend, timeout, max_nodes))
+
+                yield from future.result()
+
+
+def throughput(boards, workers=None, chunksize=64, backend='backtrack'):
+    """
+    Times solve_many over a list of boards (the boards are not changed)
+    input: boards: list of boards
+    input: workers, chunksize, backend: same as solve_many
+    output: float puzzles solved per second
+    """
+    start = time.perf_counter()
+    count = sum(1 for _ in solve_many(boards, workers, chunksize, False, backend))
+    elapsed = time.perf_counter() - start
+
+    return count / elapsed if elapsed > 0 else float('inf')
+
+
+def scaling(boards, max_workers=None, chunksize=64, backend='backtrack'):
+    """
+    Measures throughput for 1 up to max_workers processes
+    input: boards: list of boards
+    input: max_workers: int (default: one per cpu core)
+    input: chunksize, backend: same as solve_many
+    output: dict of workers to tuple (float puzzles per second, float speedup over 1 worker)
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+
+    results = {}
+    for workers in range(1, max_workers + 1):
+        rate = throughput(boards, workers, chunksize, backend)
+        results[workers] = (rate, rate / results[1][0] if results else 1.0)
+
+    return results
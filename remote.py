@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+"""
+Async remote board fetcher with connection reuse, prefetching and a local fallback
+"""
+
+"""
+Fetching boards from a sugoku style server (GET /board?difficulty=easy returning
+{"board": [[...], ...]}):
+
+1. Connections are kept alive and reused from a small pool instead of opening a new
+    one for every board.
+2. For every difficulty asked for, a background task keeps a bounded queue topped
+    up with the next few boards, so most requests are answered straight away.
+3. The response is parsed as JSON, and a board is only used if it is 9 lists of
+    9 ints from 0 to 9.
+4. If the server is slow, down or sends junk, the board comes from the local puzzle
+    store (store.py) instead.
+
+BoardFetcher runs all of this on an asyncio loop in a background thread, so the
+game loop (or any other plain code) can ask for a board without blocking.
+
+StandInServer is a tiny local server speaking the same protocol from the puzzle
+store, for trying the fetcher out without the real site:
+    python remote.py --port 8000
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import store
+
+SIZE = 9
+
+# Boards kept ready per difficulty
+PREFETCH = 4
+
+# Connections kept open to the server
+POOL_SIZE = 2
+
+# Seconds to wait on the server before using the local store
+TIMEOUT = 5.0
+
+
+class HTTPError(Exception):
+    """
+    The server answered with something other than a usable board
+    """
+
+
+def parse_board(body):
+    """
+    input: body: bytes of the JSON response
+    output: 2d list of ints for the board
+    """
+    try:
+        board = json.loads(body)['board']
+    except (ValueError, KeyError, TypeError) as error:
+        raise HTTPError("Bad board response: {}".format(error)) from None
+
+    if (not isinstance(board, list) or len(board) != SIZE
+            or any(not isinstance(row, list) or len(row) != SIZE for row in board)
+            or any(not isinstance(value, int) or not 0 <= value <= SIZE for row in board for value in row)):
+        raise HTTPError("Bad board response: not a 9x9 board")
+
+    return board
+
+
+class Connection:
+    """
+    One keep-alive HTTP/1.1 connection
+    """
+    def __init__(self, reader, writer, host):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+
+    @classmethod
+    async def open(cls, host, port, ssl):
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl)
+        return cls(reader, writer, host)
+
+    def close(self):
+        self.writer.close()
+
+    async def get(self, target):
+        """
+        input: target: string path and query
+        output: bytes body of a 200 response
+        """
+        request = 'GET {} HTTP/1.1\r\nHost: {}\r\nAccept: application/json\r\nConnection: keep-alive\r\n\r\n'
+        self.writer.write(request.format(target, self.host).encode('ascii'))
+        await self.writer.drain()
+
+        status = await self.reader.readline()
+        parts = status.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/'):
+            raise HTTPError("Bad status line {!r}".format(status))
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+        else:
+            body = await self.reader.readexactly(int(headers.get('content-length', 0)))
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+
+        if int(parts[1]) != 200:
+            raise HTTPError("Server answered {}".format(int(parts[1])))
+
+        return body
+
+    def reusable(self):
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+
+class RemoteBoards:
+    """
+    Pooled, prefetching board source for one server. All methods run on one asyncio loop.
+    """
+    def __init__(self, url, prefetch=PREFETCH, pool_size=POOL_SIZE, timeout=TIMEOUT):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.ssl = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.path = parts.path.rstrip('/') + '/board'
+
+        self.prefetch = prefetch
+        self.timeout = timeout
+        self.idle = []
+        self.slots = asyncio.Semaphore(pool_size)
+        self.queues = {}
+        self.tasks = []
+
+        # Set while the prefetching can't reach the server
+        self.failing = False
+
+    async def fetch(self, difficulty):
+        """
+        Fetches one board from the server over a pooled connection
+        output: 2d list of ints
+        """
+        async with self.slots:
+            connection = self.idle.pop() if self.idle else await Connection.open(self.host, self.port, self.ssl)
+            try:
+                body = await connection.get('{}?difficulty={}'.format(self.path, difficulty))
+            except BaseException:
+                connection.close()
+                raise
+
+            if connection.reusable():
+                self.idle.append(connection)
+
+        return parse_board(body)
+
+    async def fill(self, difficulty, queue):
+        """
+        Keeps a difficulty's queue topped up until cancelled
+        """
+        while True:
+            try:
+                board = await asyncio.wait_for(self.fetch(difficulty), self.timeout)
+            except (OSError, HTTPError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                # Server trouble: back off a little, get() falls back to the store meanwhile
+                self.failing = True
+                await asyncio.sleep(self.timeout)
+                continue
+            self.failing = False
+            await queue.put(board)
+
+    async def get(self, difficulty):
+        """
+        input: difficulty: 'easy', 'medium' or 'hard'
+        output: 2d list of ints, from the prefetch queue, the server or the local store
+        """
+        if difficulty not in store.DIFFICULTIES:
+            raise ValueError("Unknown difficulty '{}', expected one of {}".format(difficulty, store.DIFFICULTIES))
+
+        if difficulty not in self.queues and self.prefetch:
+            self.queues[difficulty] = asyncio.Queue(maxsize=self.prefetch)
+            self.tasks.append(asyncio.ensure_future(self.fill(difficulty, self.queues[difficulty])))
+
+        queue = self.queues.get(difficulty)
+        if queue is not None and queue.empty() and self.failing:
+            return store.random_board(difficulty).tolist()
+
+        try:
+            if queue is not None:
+                return await asyncio.wait_for(queue.get(), self.timeout)
+            return await asyncio.wait_for(self.fetch(difficulty), self.timeout)
+        except (OSError, HTTPError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            return store.random_board(difficulty).tolist()
+
+    async def close(self):
+        """
+        Stops the prefetching and closes the pooled connections
+        """
+        # wait_for can swallow a cancel that lands just as a fetch finishes,
+        # so keep cancelling until every task is really done
+        pending = set(self.tasks)
+        while pending:
+            for task in pending:
+                task.cancel()
+            _, pending = await asyncio.wait(pending, timeout=0.1)
+        self.tasks = []
+
+        for connection in self.idle:
+            connection.close()
+        self.idle = []
+
+
+class BoardFetcher:
+    """
+    Runs RemoteBoards on its own event loop thread so plain code can use it without blocking
+    """
+    def __init__(self, url, prefetch=PREFETCH, pool_size=POOL_SIZE, timeout=TIMEOUT):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.timeout = timeout
+        self.remote = self.call(self.make_remote, url, prefetch, pool_size, timeout).result()
+
+    @staticmethod
+    async def make_remote(url, prefetch, pool_size, timeout):
+        # The semaphore and queues have to be made on the fetcher's own loop
+        return RemoteBoards(url, prefetch, pool_size, timeout)
+
+    def call(self, function, *args):
+        return asyncio.run_coroutine_threadsafe(function(*args), self.loop)
+
+    def request(self, difficulty):
+        """
+        Starts fetching a board without waiting (also starts prefetching the difficulty)
+        output: concurrent.futures.Future of a 2d list of ints
+        """
+        return self.call(self.remote.get, difficulty)
+
+    def get_board(self, difficulty):
+        """
+        Waits for a board, which is instant once the prefetch queue has filled up
+        output: 2d list of ints
+        """
+        return self.request(difficulty).result(self.timeout * 2)
+
+    def close(self):
+        self.call(self.remote.close).result(self.timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def fetch_board(url, difficulty, timeout=TIMEOUT):
+    """
+    Fetches a single board, for plain code that only needs one
+    input: url: string server address, e.g. 'https://sugoku.herokuapp.com'
+    input: difficulty: 'easy', 'medium' or 'hard'
+    input: timeout: float seconds to wait before using the local store
+    output: 2d list of ints
+    """
+    async def fetch():
+        remote = RemoteBoards(url, prefetch=0, timeout=timeout)
+        try:
+            return await remote.get(difficulty)
+        finally:
+            await remote.close()
+
+    return asyncio.run(fetch())
+
+
+class StandInServer:
+    """
+    Local HTTP server answering GET /board?difficulty=... from the puzzle store
+    """
+    def __init__(self, host='127.0.0.1', port=0, path=store.DEFAULT_PATH):
+        self.host = host
+        self.port = port
+        self.puzzles = store.PuzzleStore(path)
+        self.server = None
+
+    async def start(self):
+        """
+        Starts listening. With port 0 a free port is picked and saved in self.port.
+        """
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.puzzles.close()
+
+    async def handle(self, reader, writer):
+        """
+        Serves requests on one connection until the client closes it
+        """
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    break
+
+                keep_alive = True
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    if line.lower().startswith(b'connection:') and b'close' in line.lower():
+                        keep_alive = False
+
+                status, body = self.respond(request)
+                writer.write('HTTP/1.1 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n{}\r\n'.format(
+                    status, len(body), '' if keep_alive else 'Connection: close\r\n').encode('ascii') + body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, request):
+        """
+        input: request: bytes request line
+        output: tuple (string status, bytes body)
+        """
+        parts = request.decode('latin-1').split()
+        if len(parts) != 3 or parts[0] != 'GET':
+            return '400 Bad Request', b'{}'
+
+        target = urlsplit(parts[1])
+        difficulty = parse_qs(target.query).get('difficulty', ['easy'])[0]
+        if not target.path.endswith('/board') or difficulty not in store.DIFFICULTIES:
+            return '404 Not Found', b'{}'
+
+        board = self.puzzles.random(difficulty).tolist()
+        return '200 OK', json.dumps({'board': board}).encode('ascii')
+
+
+async def serve(host, port):
+    server = StandInServer(host, port)
+    await server.start()
+    print('Serving boards from {} on {}'.format(server.puzzles.path, server.url))
+    await server.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the sugoku board server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
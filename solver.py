@@ -6,13 +6,40 @@ Bryce Frentz
 September 2020
 """
 
-import pprint
-import requests
-import json
-
+import argparse
+import os
+import sys
+import time
+from math import isqrt
+
+import backends
+import bitmask
+import logic
+from board import SYMBOLS, Board, copy_board
+
+# What compare runs, as (name, backend, strategy, lcv)
+COMPARED = (
+    ('reading', 'backtrack', 'reading', False),
+    ('mrv', 'backtrack', 'mrv', False),
+    ('mrv+lcv', 'backtrack', 'mrv', True),
+    ('logic', 'backtrack', 'logic', False),
+    ('dlx', 'dlx', 'logic', False),
+)
+
+
+def get_board(difficulty=None, url=None):
+    """
+    Gets a random starting board from the local puzzle store (store.py), no network needed,
+    or from a sugoku style server if a url is given (falling back to the store, see remote.py)
+    input: difficulty: 'easy', 'medium' or 'hard', or None to ask for it
+    input: url: string server address, or None for the local store
+    output: Board for the starting board
+    """
+    # Imported here so solving (and the worker processes) never loads the store or the network code
+    import remote
+    import store
 
-def get_board():
-    valid_difficulty = False
+    valid_difficulty = difficulty is not None
     while not valid_difficulty:
         diff = input("What difficulty of sudoku puzzle (1=easy, 2=medium, 3=hard)? \n")
         if diff == '1':
@@ -27,20 +54,16 @@ def get_board():
         else:
             print("\nPlease input a valid difficulty.\n")
 
-    link = 'https://sugoku.herokuapp.com/board?difficulty='+difficulty
-    req = requests.get(link)
-    board = json.loads(req.text[9:-2])
-    return board
+    if url is not None:
+        return Board(remote.fetch_board(url, difficulty))
 
-    # #DEBUG
-    # print(req.text[9:-2])
-    # print(b[2])
+    return store.random_board(difficulty)
 
 # DEBUG
 #get_board()
 
 
-# Boards will be 2d list of 9 separate lists of ints
+# Boards will be 2d list of 9 separate lists of ints (16 or 25 for the bigger boards)
 # One list for each row
 EMPTY = 0
 testBoard = [
@@ -58,26 +81,27 @@ testBoard = [
 def print_board(board):
     """
     Prints the board
-    input: board: 2d List of ints and empty characters (could be 0, 0, or whatever)
+    input: board: 2d List of ints and empty characters (could be 0, 0, or whatever), any N^2 x N^2 size
     output: None
     """
-    line = '---------------------'
+    box = isqrt(len(board))
+    line = '-' * (2 * len(board) + 2 * box - 3)
     print()
 
     # loop over rows
     for i in range(len(board)):
-        if i != 0 and i % 3 == 0:
+        if i != 0 and i % box == 0:
             print(line)
 
         # Loop over columns in row
         for j in range(len(board[i])):
-            if j != 0 and j % 3 == 0:
+            if j != 0 and j % box == 0:
                 print('|', end=' ')
 
-            if j == 8:
-                print(board[i][j], end='\n')
+            if j == len(board[i]) - 1:
+                print(SYMBOLS[board[i][j]], end='\n')
             else:
-                print(board[i][j], end=' ')
+                print(SYMBOLS[board[i][j]], end=' ')
 
     #print(line)
     print()
@@ -125,94 +149,197 @@ def valid_number(board, number, position):
     input: position: tuple for spot in grid (row, column)
     output: bool
     """
+    # Every other square in the row, column and box, worked out once per board size
+    shape = bitmask.layout(len(board))
+    positions = shape.positions
+    peers = shape.peers_of[position[0] * shape.size + position[1]]
+    return all(board[i][j] != number for i, j in (positions[p] for p in peers))
 
 
-    # Check row
-    for i in range(len(board[position[0]])):
-        #print(board[position[0]][i], end=' ')
-        if board[position[0]][i] == number and position[1] != i:
-            #print("Number in row.")
-            return False
-
-    #print()
-
-    # Check column
-    for j in range(len(board)):
-        #print(board[j][position[1]], end='\n')
-        if board[j][position[1]] == number and position[0] != j:
-            #print("Number in col.")
-            return False
-
-    # Check boxes
-    # 0,0 | 0,1 | 0,2
-    # ---------------
-    # 1,0 | 1,1 | 1,2
-    # ---------------
-    # 2,0 | 2,1 | 2,2
-
-    box_x = position[0] // 3
-    box_y = position[1] // 3
-
-    # # DEBUG
-    # print()
-    # print(box_x, box_y)
-    # print()
+# DEBUG
+#print(valid_number(board1, 4, (6,0)))
 
-    for i in range(box_x*3, box_x*3+3):
-        for j in range(box_y*3, box_y*3+3):
-            # # DEBUG
-            # print(i, j)
-            # print(board[i][j])
-            if board[i][j] == number and position[0] != i and position[1] !=j:
-                return False
 
-    return True
+def solve(board, strategy='logic', lcv=False, backend='backtrack'):
+    """
+    Solves a sudoku board recursively using backtracking.
+    Same search as steps 1-4 above, but the valid number checks are done with the
+    row/column/box bitmasks in bitmask.py instead of scanning the board each time.
+    input: board: 2d list of ints (or a Board from board.py) with 0 for the empty squares
+    input: strategy: 'logic' fills in everything the rules in logic.py can prove before
+        every guess, 'reading' finds the empty space like step 1, 'mrv' picks the space
+        with the fewest valid numbers left (ties go to the one with the most empty neighbors)
+    input: lcv: bool, with 'mrv' try the numbers that block the fewest neighbors first
+    input: backend: 'backtrack' for the search above or 'dlx' for Dancing Links (dlx.py),
+        which ignores strategy and lcv
+    output: bool for whether a solution was found (board is filled in place)
+    """
+    return backends.solve(board, backend, strategy, lcv)
 
 
-# DEBUG
-#print(valid_number(board1, 4, (6,0)))
+def count_solutions(board, limit=2):
+    """
+    Counts the solutions of a board, stopping as soon as limit of them are found.
+    Uses the same logic and most constrained guessing as solve (see logic.py).
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares, not changed
+    input: limit: int, the most solutions to look for
+    output: int number of solutions found (at most limit)
+    """
+    return logic.count_solutions(board, limit)
 
 
-def solve(board):
+def has_unique_solution(board):
     """
-    Solves a sudoku board recursively using backtracking
-    input: board: 2d list of ints and empty character (could be 'X', 0, or whatever)
-    output: solved board
+    input: board: 2d list of ints (or a Board) with 0 for the empty squares, not changed
+    output: bool for whether the board has exactly one solution
     """
+    return logic.has_unique_solution(board)
 
-    # Check and return for last square
-    empty = find_empty(board)
-    if not empty:
-        return True
-    else:
-        row, col = empty
 
-    # Loop through numbers 1-9 to see if they work
-    for i in range(1, 10):
-        if valid_number(board, i, (row, col)):
-            board[row][col] = i
-
-            # Recursive check
-            if solve(board):
-                return True
+def compare(board, timeout=None, max_nodes=None):
+    """
+    Prints how many guesses each engine and way of picking the next space needs for a board
+    input: board: 2d list of ints (or a Board), not changed
+    input: timeout, max_nodes: give up on each engine after this many seconds / guesses, or None
+    """
+    # Only the command line compares, so solving never loads these
+    import dlx
+    import instrument
+
+    if timeout is None and max_nodes is None:
+        for name, nodes in bitmask.compare_strategies(board).items():
+            print('{:>8} search nodes: {}'.format(name, nodes))
+        print('{:>8} search nodes: {}'.format('logic', logic.run(copy_board(board)).nodes))
+        print('{:>8} search nodes: {}'.format('dlx', dlx.run(copy_board(board)).nodes))
+        return
+
+    # With limits every engine runs through instrument.profile, which keeps to them
+    for name, backend, strategy, lcv in COMPARED:
+        stats = instrument.profile(copy_board(board), backend, strategy, lcv, timeout=timeout, max_nodes=max_nodes)
+        print('{:>8} search nodes: {}{}'.format(name, stats.nodes,
+                                                ' (gave up: {})'.format(stats.gave_up) if stats.gave_up else ''))
+
+
+def run_batch(input_path, output_path=None, backend='backtrack', workers=1, vectorized=False, cache_path=None,
+              timeout=None, max_nodes=None, input_format=None, output_format=None):
+    """
+    Solves a whole file of puzzles without asking anything
+    input: input_path: string path of the puzzle file
+    input: output_path: string path for the solutions, or None to print them
+    input: backend: solver engine (see backends.py)
+    input: workers: int number of processes to solve with
+    input: vectorized: bool for the numpy batch solver (vectorized.py)
+    input: cache_path: string file for the solution cache (cache.py), or None for no cache
+    input: timeout, max_nodes: give up on a puzzle after this many seconds / guesses, or None
+    input: input_format, output_format: one of formats.FORMATS, or None to go by the file extension
+    """
+    # Imported here so solving a single board never loads the file handling
+    import batch
+    import formats
+
+    solutions = None
+    if cache_path is not None:
+        import cache
+        solutions = cache.SolutionCache(path=cache_path, backend=backend)
+
+    start = time.perf_counter()
+    input_file, input_format = formats.open_puzzles(input_path, 'r', input_format)
+    with input_file:
+        if output_path is None:
+            output_format = output_format or 'line'
+            output_file = sys.stdout.buffer if formats.MODES[output_format] == 'b' else sys.stdout
+            total, solved = batch.solve_file(input_file, output_file, backend, workers, vectorized, solutions,
+                                             timeout, max_nodes, input_format, output_format)
+        else:
+            output_file, output_format = formats.open_puzzles(output_path, 'w', output_format)
+            with output_file:
+                total, solved = batch.solve_file(input_file, output_file, backend, workers, vectorized, solutions,
+                                                 timeout, max_nodes, input_format, output_format)
+    elapsed = time.perf_counter() - start
 
-            board[row][col] = EMPTY
+    print('Solved {} of {} puzzles ({:.1f} puzzles/s).'.format(solved, total, total / elapsed if elapsed else 0),
+          file=sys.stderr)
 
-    return False
+    if solutions is not None:
+        solutions.save()
+        stats = solutions.stats()
+        print('Cache: {} hits, {} misses ({:.0%} hit rate), {} entries.'.format(
+            stats['hits'], stats['misses'], stats['hit_rate'], stats['size']), file=sys.stderr)
 
 
 # Print and run nicely
 def main():
-    b = get_board()
+    import formats
+    import instrument
+    import store
+
+    parser = argparse.ArgumentParser(description='Solve a sudoku board from the local puzzle store')
+    parser.add_argument('--difficulty', choices=store.DIFFICULTIES,
+                        help='difficulty of the board to solve (default: ask)')
+    parser.add_argument('--remote', metavar='URL',
+                        help='get the board from a sugoku style server, e.g. https://sugoku.herokuapp.com')
+    parser.add_argument('--backend', choices=backends.BACKENDS, default='backtrack',
+                        help='solver engine to use (default: backtrack)')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='solve every puzzle in FILE (81 characters per line, 0 or . for empty) instead')
+    parser.add_argument('--output', metavar='FILE',
+                        help='where --batch writes the solutions (default: print them)')
+    parser.add_argument('--input-format', choices=formats.FORMATS,
+                        help='format of the --batch file (default: from its extension, see formats.py)')
+    parser.add_argument('--output-format', choices=formats.FORMATS,
+                        help='format of the --output file (default: from its extension)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes --batch solves with, 0 for one per cpu core (default: 1)')
+    parser.add_argument('--numpy', action='store_true',
+                        help='--batch fills in singles for many puzzles at once with numpy')
+    parser.add_argument('--cache', metavar='FILE',
+                        help='--batch reuses solutions of equivalent puzzles, kept in FILE between runs '
+                             '(single process only)')
+    parser.add_argument('--compare', action='store_true',
+                        help='first solve copies of the board with every engine and print their guesses')
+    parser.add_argument('--stats', action='store_true',
+                        help='print what the solver did: guesses, backtracks, depth, checks and timings')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='give up on a board after this long (with --batch: on each board)')
+    parser.add_argument('--max-nodes', type=int, metavar='N',
+                        help='give up on a board after this many guesses (with --batch: on each board)')
+    args = parser.parse_args()
+
+    # The cache is only looked up by the single process solve, the pool and numpy never see it
+    if args.cache and (args.numpy or args.workers != 1):
+        parser.error('--cache only works with a single process solve, not with --workers or --numpy')
+
+    if args.batch:
+        try:
+            run_batch(args.batch, args.output, args.backend, args.workers or os.cpu_count() or 1, args.numpy,
+                      args.cache, args.timeout, args.max_nodes, args.input_format, args.output_format)
+        except ValueError as error:
+            sys.exit('{}: {}'.format(args.batch, error))
+        return
+
+    b = get_board(args.difficulty, args.remote)
     print()
     print_board(b)
     print()
-    solve(b)
+
+    if args.compare:
+        compare(b, args.timeout, args.max_nodes)
+
+    if args.stats or args.timeout is not None or args.max_nodes is not None:
+        stats = instrument.profile(b, backend=args.backend, timeout=args.timeout, max_nodes=args.max_nodes)
+        if args.stats:
+            for name, value in stats.as_dict().items():
+                print('{:>14}: {}'.format(name, round(value, 6) if isinstance(value, float) else value))
+        if stats.gave_up:
+            print('Gave up ({}) after {} guesses.'.format(stats.gave_up, stats.nodes))
+    else:
+        solve(b, backend=args.backend)
     print_board(b)
     print()
 
 
-# Run
-main()
+# Run (guarded so the worker processes in parallel.py can import this file)
+if __name__ == '__main__':
+    main()
 
 
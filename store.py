@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+"""
+Offline puzzle store: packed binary file with memory-mapped random access
+"""
+
+"""
+File layout (all numbers little endian):
+
+    header   4 bytes  b'SDKS'
+             2 bytes  format version
+             8 bytes  per difficulty (easy, medium, hard): first record, record count
+    records  41 bytes each, grouped by difficulty
+
+A record is the 81 squares read like a book, two squares per byte (high nibble
+first, 0 for empty), with the last low nibble left 0, the same records as the packed
+puzzle files (formats.pack). Since every record has the same size, puzzle n of a
+difficulty starts at a fixed offset and is read straight out of the memory-mapped
+file, with nothing parsed up front.
+
+Build a store from puzzle files (one 81 character puzzle per line, see generator.py, or
+any other format from formats.py):
+    python store.py --easy easy.txt --medium medium.txt --hard hard.txt --output puzzles.store
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+import formats
+
+SIZE = 9
+DIFFICULTIES = ('easy', 'medium', 'hard')
+MAGIC = b'SDKS'
+VERSION = 1
+RECORD_SIZE = (SIZE * SIZE + 1) // 2
+HEADER = struct.Struct('<4sH' + 'II' * len(DIFFICULTIES))
+
+# The store that ships next to this file
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzles.store')
+
+
+def write_store(path, puzzles):
+    """
+    Writes a store file
+    input: path: string file to write
+    input: puzzles: dict of difficulty to iterable of boards (read one at a time)
+    output: dict of difficulty to int number of puzzles written
+    """
+    counts = {}
+    sections = []
+    # Written next to the old store and moved over it at the end, so a puzzle file that
+    # can't be read doesn't leave a broken store behind
+    partial = path + '.partial'
+    with open(partial, 'wb') as file:
+        file.write(bytes(HEADER.size))
+
+        first = 0
+        for difficulty in DIFFICULTIES:
+            count = 0
+            for board in puzzles.get(difficulty, ()):
+                file.write(formats.pack(board))
+                count += 1
+            sections += [first, count]
+            counts[difficulty] = count
+            first += count
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, *sections))
+
+    os.replace(partial, path)
+    return counts
+
+
+class PuzzleStore:
+    """
+    Read only view of a store file. Use as a context manager or call close().
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file can't be mapped
+            self.file.close()
+            raise ValueError("{} is not a puzzle store".format(path)) from None
+
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise ValueError("{} is not a puzzle store".format(path))
+
+        magic, version, *sections = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("{} is not a version {} puzzle store".format(path, VERSION))
+
+        self.sections = {difficulty: (sections[2 * k], sections[2 * k + 1])
+                         for k, difficulty in enumerate(DIFFICULTIES)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def count(self, difficulty):
+        """
+        output: int number of puzzles stored for the difficulty
+        """
+        return self.section(difficulty)[1]
+
+    def section(self, difficulty):
+        if difficulty not in self.sections:
+            raise ValueError("Unknown difficulty '{}', expected one of {}".format(difficulty, DIFFICULTIES))
+        return self.sections[difficulty]
+
+    def get(self, difficulty, index):
+        """
+        input: difficulty: one of DIFFICULTIES
+        input: index: int position of the puzzle within its difficulty
+        output: Board
+        """
+        first, count = self.section(difficulty)
+        if not 0 <= index < count:
+            raise IndexError("puzzle {} out of range for {} ({} stored)".format(index, difficulty, count))
+
+        offset = HEADER.size + (first + index) * RECORD_SIZE
+        return formats.unpack(self.data[offset:offset + RECORD_SIZE])
+
+    def random(self, difficulty, rng=random):
+        """
+        output: Board, a random puzzle of the difficulty
+        """
+        count = self.count(difficulty)
+        if count == 0:
+            raise LookupError("No {} puzzles in {}".format(difficulty, self.path))
+        return self.get(difficulty, rng.randrange(count))
+
+
+def random_board(difficulty, path=DEFAULT_PATH):
+    """
+    input: difficulty: one of DIFFICULTIES
+    input: path: string store file (default: the one shipped with the solver)
+    output: Board, a random puzzle of the difficulty
+    """
+    with PuzzleStore(path) as store:
+        return store.random(difficulty)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a puzzle store from puzzle files')
+    for difficulty in DIFFICULTIES:
+        parser.add_argument('--' + difficulty, metavar='FILE',
+                            help='{} puzzles, in any format from formats.py'.format(difficulty))
+    parser.add_argument('--output', metavar='FILE', default=DEFAULT_PATH,
+                        help='store file to write (default: puzzles.store next to this file)')
+    args = parser.parse_args()
+
+    files = {difficulty: formats.open_puzzles(getattr(args, difficulty)) for difficulty in DIFFICULTIES
+             if getattr(args, difficulty)}
+    try:
+        counts = write_store(args.output, {difficulty: formats.read_puzzles(file, fmt)
+                                           for difficulty, (file, fmt) in files.items()})
+    except ValueError as error:
+        os.remove(args.output + '.partial')
+        sys.exit('{}: {}'.format(', '.join(file.name for file, fmt in files.values()), error))
+    finally:
+        for file, fmt in files.values():
+            file.close()
+
+    print(', '.join('{} {}'.format(count, difficulty) for difficulty, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+Tests for batch solving (batch.py), run with pytest
+"""
+
+import io
+import json
+
+import pytest
+
+import batch
+import formats
+from board import Board
+
+PUZZLE = '530070000600195000098000060800060003400803001700020006060000280000419005000080079'
+SOLUTION = '534678912672195348198342567859761423426853791713924856961537284287419635345286179'
+
+# Two 3s in the first row, no solution
+BROKEN = '33' + PUZZLE[2:]
+
+
+def test_parse_format_round_trip():
+    for line in (PUZZLE, SOLUTION):
+        assert batch.format_board(batch.parse_line(line)) == line
+    assert batch.format_board(batch.parse_line(PUZZLE.replace('0', '.'))) == PUZZLE
+
+
+def test_parse_line_16x16():
+    board = Board([[0] * 16 for _ in range(16)])
+    board[0][0] = 16
+    line = batch.format_board(board)
+    assert line[0] == 'G' and len(line) == 256
+    assert batch.parse_line(line).cells == board.cells
+
+
+def test_parse_line_bad_length():
+    with pytest.raises(ValueError):
+        batch.parse_line(PUZZLE[:-1])
+
+
+def test_read_puzzles_skips_comments_and_blanks():
+    lines = ['# comment\n', '\n', PUZZLE + '\n', '  ' + SOLUTION + '  \n']
+    assert [batch.format_board(board) for board in batch.read_puzzles(lines)] == [PUZZLE, SOLUTION]
+
+
+def test_read_puzzles_names_the_line():
+    with pytest.raises(ValueError, match='Line 3'):
+        list(batch.read_puzzles(['# comment', PUZZLE, 'abc']))
+
+
+def test_read_puzzles_binary_file(tmp_path):
+    path = tmp_path / 'puzzles.store'
+    path.write_bytes(b'SDKS\xff\xfe\x00\x01')
+    with open(path) as file, pytest.raises(ValueError, match='Line 1'):
+        list(batch.read_puzzles(file))
+
+
+def test_solve_file_lines():
+    output = io.StringIO()
+    counts = batch.solve_file(io.StringIO(PUZZLE + '\n' + BROKEN + '\n'), output)
+    assert counts == (2, 1)
+    assert output.getvalue().splitlines() == [SOLUTION, BROKEN]
+
+
+@pytest.mark.parametrize('backend', ['backtrack', 'dlx', 'iterative'])
+def test_solve_file_backends(backend):
+    output = io.StringIO()
+    assert batch.solve_file(io.StringIO(PUZZLE), output, backend) == (1, 1)
+    assert output.getvalue() == SOLUTION + '\n'
+
+
+def test_solve_file_keeps_jsonl_fields():
+    records = [{'puzzle': PUZZLE, 'id': 1, 'source': 'wiki'}, {'puzzle': BROKEN, 'id': 2}]
+    source = io.StringIO(''.join(json.dumps(record) + '\n' for record in records))
+    output = io.StringIO()
+    assert batch.solve_file(source, output, input_format='jsonl', output_format='jsonl') == (2, 1)
+
+    written = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert written == [{'puzzle': SOLUTION, 'id': 1, 'source': 'wiki'}, {'puzzle': BROKEN, 'id': 2}]
+
+
+def test_solve_file_between_formats():
+    source = io.StringIO(PUZZLE + '\n')
+    output = io.BytesIO()
+    assert batch.solve_file(source, output, input_format='line', output_format='packed') == (1, 1)
+
+    output.seek(0)
+    assert [batch.format_board(board) for board in formats.read_puzzles(output, 'packed')] == [SOLUTION]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the solution cache (cache.py), run with pytest
+"""
+
+import random
+
+import pytest
+
+import cache
+from batch import format_board, parse_line
+
+PUZZLE = '530070000600195000098000060800060003400803001700020006060000280000419005000080079'
+SOLUTION = '534678912672195348198342567859761423426853791713924856961537284287419635345286179'
+OTHERS = [
+    '003020600900305001001806400008102900700000008006708200002609500800203009005010300',
+    '100007090030020008009600500005300900010080002600004000300000010040000007007000300',
+]
+
+
+def disguise(line, rng):
+    """
+    Applies a random mix of the changes canonical() sees through
+    input: line: string of 81 digits
+    input: rng: random.Random
+    output: string of 81 digits
+    """
+    grid = [[int(line[i * 9 + j]) for j in range(9)] for i in range(9)]
+
+    labels = list(range(1, 10))
+    rng.shuffle(labels)
+    grid = [[labels[value - 1] if value else 0 for value in row] for row in grid]
+
+    def order():
+        bands = rng.sample(range(3), 3)
+        return [band * 3 + k for band in bands for k in rng.sample(range(3), 3)]
+
+    rows, columns = order(), order()
+    grid = [[grid[i][j] for j in columns] for i in rows]
+    if rng.random() < 0.5:
+        grid = [list(column) for column in zip(*grid)]
+
+    return ''.join(str(value) for row in grid for value in row)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_disguises_share_a_key(seed):
+    rng = random.Random(seed)
+    key, _ = cache.canonical(parse_line(PUZZLE))
+    assert cache.canonical(parse_line(disguise(PUZZLE, rng)))[0] == key
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_hit_maps_the_solution_back(seed):
+    rng = random.Random(seed)
+    solutions = cache.SolutionCache()
+    board = parse_line(PUZZLE)
+    assert solutions.solve(board) and format_board(board) == SOLUTION
+
+    # The same disguise applied to the solution is the only solution of the disguised puzzle
+    state = random.Random(seed).getstate()
+    puzzle = disguise(PUZZLE, rng)
+    rng.setstate(state)
+    expected = disguise(SOLUTION, rng)
+
+    board = parse_line(puzzle)
+    assert solutions.solve(board)
+    assert format_board(board) == expected
+    assert solutions.stats()['hits'] == 1 and solutions.stats()['misses'] == 1
+
+
+def test_no_solution_is_cached():
+    solutions = cache.SolutionCache()
+    broken = '55' + PUZZLE[2:]
+    for _ in range(2):
+        board = parse_line(broken)
+        assert not solutions.solve(board)
+        assert format_board(board) == broken
+    assert solutions.stats()['hits'] == 1
+
+
+def test_least_recently_used_go_first():
+    solutions = cache.SolutionCache(maxsize=2)
+    keys = [cache.canonical(parse_line(line))[0] for line in [PUZZLE] + OTHERS]
+
+    solutions.solve(parse_line(PUZZLE))
+    solutions.solve(parse_line(OTHERS[0]))
+    solutions.solve(parse_line(PUZZLE))
+    solutions.solve(parse_line(OTHERS[1]))
+
+    assert len(solutions) == 2
+    assert keys[1] not in solutions.entries
+    assert keys[0] in solutions.entries and keys[2] in solutions.entries
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'cache.txt')
+    solutions = cache.SolutionCache(path=path)
+    for line in [PUZZLE, '55' + PUZZLE[2:]] + OTHERS:
+        solutions.solve(parse_line(line))
+    solutions.save()
+
+    loaded = cache.SolutionCache(path=path)
+    assert list(loaded.entries.items()) == list(solutions.entries.items())
+
+    board = parse_line(disguise(PUZZLE, random.Random(1)))
+    assert loaded.solve(board)
+    assert loaded.stats()['hits'] == 1 and loaded.stats()['misses'] == 0
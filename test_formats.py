@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+Round trip tests for the puzzle file formats (formats.py), run with pytest
+"""
+
+import io
+import json
+
+import pytest
+
+import backends
+import formats
+from batch import format_board, parse_line
+from board import Board
+
+PUZZLE = '530070000600195000098000060800060003400803001700020006060000280000419005000080079'
+
+
+def boards():
+    """
+    output: list of a 9x9 puzzle and a full 9x9 board
+    """
+    solved = parse_line(PUZZLE)
+    backends.solve(solved, 'dlx')
+    return [parse_line(PUZZLE), solved]
+
+
+def big_board():
+    """
+    output: full 16x16 Board
+    """
+    board = Board([[0] * 16 for _ in range(16)])
+    backends.solve(board, 'dlx')
+    return board
+
+
+def round_trip(items, fmt, validate=True):
+    """
+    input: items: list of boards
+    input: fmt: one of formats.FORMATS
+    output: list of the boards read back after writing them out
+    """
+    file = io.BytesIO() if formats.MODES[fmt] == 'b' else io.StringIO()
+    assert formats.write_puzzles(file, items, fmt) == len(items)
+    file.seek(0)
+    return list(formats.read_puzzles(file, fmt, validate))
+
+
+@pytest.mark.parametrize('fmt', formats.FORMATS)
+def test_round_trip(fmt):
+    items = boards()
+    assert [format_board(board) for board in round_trip(items, fmt)] == [format_board(board) for board in items]
+
+
+@pytest.mark.parametrize('fmt', ['line', 'grid', 'jsonl'])
+def test_round_trip_16x16(fmt):
+    board = big_board()
+    board[0][0] = board[5][7] = 0
+    assert format_board(round_trip([board], fmt)[0]) == format_board(board)
+
+
+def test_packed_only_holds_9x9():
+    with pytest.raises(ValueError):
+        formats.pack(big_board())
+
+
+def test_pack_unpack():
+    for board in boards():
+        assert formats.unpack(formats.pack(board)).cells == board.cells
+
+
+def test_records_keep_fields():
+    file = io.StringIO()
+    formats.write_records(file, [(parse_line(PUZZLE), {'id': 7, 'source': 'wiki'})])
+    file.seek(0)
+    (board, fields), = formats.read_records(file, validate=True)
+    assert format_board(board) == PUZZLE
+    assert fields == {'id': 7, 'source': 'wiki'}
+
+
+def test_validate_rejects_broken_rules():
+    line = '55' + PUZZLE[2:]
+    with pytest.raises(ValueError, match='Line 1'):
+        list(formats.read_lines([line], validate=True))
+
+
+def test_grid_reads_printed_board():
+    text = '\n'.join(['5 3 0 | 0 7 0 | 0 0 0', '6 0 0 | 1 9 5 | 0 0 0', '0 9 8 | 0 0 0 | 0 6 0',
+                      '---------------------',
+                      '8 0 0 | 0 6 0 | 0 0 3', '4 0 0 | 8 0 3 | 0 0 1', '7 0 0 | 0 2 0 | 0 0 6',
+                      '---------------------',
+                      '0 6 0 | 0 0 0 | 2 8 0', '0 0 0 | 4 1 9 | 0 0 5', '0 0 0 | 0 8 0 | 0 7 9'])
+    assert format_board(next(formats.read_grids(text.splitlines()))) == PUZZLE
+
+
+def test_parse_text():
+    record = json.dumps({'puzzle': PUZZLE, 'id': 1})
+    for text in (PUZZLE, record, formats.format_grid(parse_line(PUZZLE))):
+        assert format_board(formats.parse_text(text)) == PUZZLE
+
+
+def test_parse_text_16x16_grid():
+    board = big_board()
+    board[3][3] = 0
+    assert formats.parse_text(formats.format_grid(board)).cells == board.cells
+
+
+@pytest.mark.parametrize('path, fmt', [('a.txt', 'line'), ('a.sdm', 'line'), ('a.sdk', 'grid'), ('a.GRID', 'grid'),
+                                       ('a.jsonl', 'jsonl'), ('a.bin', 'packed'), ('a', 'line')])
+def test_guess_format(path, fmt):
+    assert formats.guess_format(path) == fmt
+
+
+@pytest.mark.parametrize('fmt', ['line', 'grid', 'jsonl'])
+def test_binary_file_is_value_error(tmp_path, fmt):
+    path = tmp_path / 'puzzles'
+    path.write_bytes(b'\xff\xfe\x00binary')
+    file, fmt = formats.open_puzzles(str(path), 'r', fmt)
+    with file, pytest.raises(ValueError, match='Line 1'):
+        list(formats.read_puzzles(file, fmt))
+
+
+def test_load(tmp_path):
+    path = tmp_path / 'puzzles.bin'
+    file, fmt = formats.open_puzzles(str(path), 'w')
+    with file:
+        formats.write_puzzles(file, boards(), fmt)
+
+    assert format_board(formats.load(str(path), 1)) == format_board(boards()[1])
+    with pytest.raises(IndexError):
+        formats.load(str(path), 2)
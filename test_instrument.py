@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the limits of instrument.profile, run with pytest
+"""
+
+import pytest
+
+import instrument
+import logic
+from batch import read_puzzles
+from board import copy_board
+
+# Needs 64 guesses even with all the logic rules
+PUZZLE = '100007090030020008009600500005300900010080002600004000300000010040000007007000300'
+
+
+@pytest.mark.parametrize('backend, strategy', [('backtrack', 'logic'), ('backtrack', 'mrv'),
+                                               ('dlx', 'logic'), ('iterative', 'logic')])
+@pytest.mark.parametrize('budget', [0, 1, 5])
+def test_node_budget_is_exact(backend, strategy, budget):
+    board = next(read_puzzles([PUZZLE]))
+    original = copy_board(board)
+    stats = instrument.profile(board, backend, strategy, max_nodes=budget)
+    assert stats.gave_up == 'node budget'
+    assert stats.nodes == budget
+    assert board == original
+
+
+def test_budget_of_exactly_enough_solves():
+    board = next(read_puzzles([PUZZLE]))
+    needed = logic.run(copy_board(board)).nodes
+    stats = instrument.profile(board, max_nodes=needed)
+    assert stats.solved and stats.gave_up is None and stats.nodes == needed
+
+
+def test_cancelled_before_the_first_guess():
+    token = instrument.CancelToken()
+    token.cancel()
+    stats = instrument.profile(next(read_puzzles([PUZZLE])), cancel=token)
+    assert stats.gave_up == 'cancelled' and stats.nodes == 0
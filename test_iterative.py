@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the pausable search (iterative.py) against the recursive engines, run with pytest
+"""
+
+import pytest
+
+import bitmask
+import instrument
+import iterative
+import logic
+from batch import format_board, parse_line
+from board import Board
+
+PUZZLES = [
+    '530070000600195000098000060800060003400803001700020006060000280000419005000080079',
+    '100007090030020008009600500005300900010080002600004000300000010040000007007000300',
+    '000000010400000000020000000000050407008000300001090000300400200050100000000806000',
+]
+
+# The recursive engine making the same guesses as each strategy
+RECURSIVE = {
+    'reading': lambda board: bitmask.run(board, 'reading'),
+    'mrv': lambda board: bitmask.run(board, 'mrv'),
+    'logic': logic.run,
+}
+
+
+@pytest.mark.parametrize('strategy', iterative.STRATEGIES)
+@pytest.mark.parametrize('line', PUZZLES)
+def test_same_as_recursive(strategy, line):
+    if strategy == 'reading' and line != PUZZLES[0]:
+        pytest.skip('reading order takes too long on the hard puzzles')
+
+    expected = parse_line(line)
+    state = RECURSIVE[strategy](expected)
+
+    board = parse_line(line)
+    search = iterative.Search(board, strategy)
+    assert search.finish()
+    assert board == expected
+    assert search.state.nodes == state.nodes
+
+
+@pytest.mark.parametrize('strategy', ['mrv', 'logic'])
+def test_pause_and_resume(strategy):
+    expected = parse_line(PUZZLES[1])
+    nodes = RECURSIVE[strategy](expected).nodes
+
+    board = parse_line(PUZZLES[1])
+    search = iterative.Search(board, strategy)
+    rounds = 1
+    while search.advance(7) is None:
+        rounds += 1
+    assert rounds > 1
+    assert search.state.solved and search.state.nodes == nodes
+    assert board == expected
+    assert search.advance(7) is True
+
+
+@pytest.mark.parametrize('strategy', ['mrv', 'logic'])
+def test_steps_match_the_hook(strategy):
+    events = []
+    stats = instrument.Stats(hook=lambda event, number, position: events.append((event, number, position)))
+    search = iterative.Search(parse_line(PUZZLES[1]), strategy, stats)
+    steps = list(search.steps())
+
+    assert steps == [step for step in events if step[0] in ('guess', 'backtrack')]
+    assert sum(event == 'guess' for event, _, _ in steps) == search.state.nodes
+
+
+def test_logic_fills_a_2d_list_at_the_end():
+    rows = parse_line(PUZZLES[0]).tolist()
+    search = iterative.Search(rows, 'logic')
+    assert search.finish()
+
+    expected = parse_line(PUZZLES[0])
+    logic.solve(expected)
+    assert rows == expected.tolist()
+
+
+def test_no_solution():
+    board = parse_line('55' + PUZZLES[0][2:])
+    assert iterative.Search(board, 'logic').finish() is False
+
+    line = '123456780' + '0' * 27 + '000000009' + '0' * 36
+    for strategy in ('mrv', 'logic'):
+        board = parse_line(line)
+        assert iterative.Search(board, strategy).finish() is False
+        assert format_board(board) == line
+
+
+def test_logic_solves_a_big_board():
+    board = Board([[0] * 16 for _ in range(16)])
+    assert iterative.Search(board, 'logic').finish()
+    assert bitmask.BitBoard(board).consistent
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""
+Tests for counting solutions (logic.py, used by solver.py and generator.py), run with pytest
+"""
+
+from itertools import combinations
+
+import logic
+import solver
+from batch import format_board, parse_line
+from board import Board
+
+PUZZLE = '530070000600195000098000060800060003400803001700020006060000280000419005000080079'
+SOLUTION = '534678912672195348198342567859761423426853791713924856961537284287419635345286179'
+
+
+def two_solutions():
+    """
+    The solution with a rectangle of two swappable digits blanked out: two rows of one band
+    and two columns of different stacks, holding a b / b a
+    output: string of 81 digits with exactly two solutions
+    """
+    grid = [[int(SOLUTION[i * 9 + j]) for j in range(9)] for i in range(9)]
+    for top, bottom in combinations(range(9), 2):
+        if top // 3 != bottom // 3:
+            continue
+        for left, right in combinations(range(9), 2):
+            if left // 3 != right // 3 and grid[top][left] == grid[bottom][right] \
+                    and grid[top][right] == grid[bottom][left]:
+                cells = [top * 9 + left, top * 9 + right, bottom * 9 + left, bottom * 9 + right]
+                return ''.join('0' if k in cells else SOLUTION[k] for k in range(81))
+
+    raise AssertionError('no swappable rectangle in the solution')
+
+
+def test_unique_puzzle():
+    board = parse_line(PUZZLE)
+    assert solver.count_solutions(board) == 1
+    assert solver.has_unique_solution(board)
+    assert format_board(board) == PUZZLE
+
+
+def test_full_board_has_one_solution():
+    assert solver.count_solutions(parse_line(SOLUTION)) == 1
+
+
+def test_two_solutions():
+    line = two_solutions()
+    board = parse_line(line)
+    assert solver.count_solutions(board, 10) == 2
+    assert not solver.has_unique_solution(board)
+    assert format_board(board) == line
+
+
+def test_stops_at_the_limit():
+    empty = [[0] * 9 for _ in range(9)]
+    assert logic.count_solutions(empty, 1) == 1
+    assert logic.count_solutions(empty, 7) == 7
+    assert empty == [[0] * 9 for _ in range(9)]
+    assert logic.count_solutions(Board([[0] * 16 for _ in range(16)]), 3) == 3
+
+
+def test_no_solution():
+    assert solver.count_solutions(parse_line('55' + PUZZLE[2:])) == 0
+
+    # No two clues clash, but the last square of the first row can't be 9
+    line = '123456780' + '0' * 27 + '000000009' + '0' * 36
+    assert solver.count_solutions(parse_line(line)) == 0
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the remote board fetcher (remote.py) against the local stand-in server, run with pytest
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+import logic
+import remote
+import solver
+import store
+from batch import parse_line
+
+# One known puzzle per difficulty for the server, none of them in the shipped store
+PUZZLES = {
+    'easy': '530070000600195000098000060800060003400803001700020006060000280000419005000080079',
+    'medium': '003020600900305001001806400008102900700000008006708200002609500800203009005010300',
+    'hard': '100007090030020008009600500005300900010080002600004000300000010040000007007000300',
+}
+
+
+def stored_boards(difficulty):
+    """
+    output: set of the puzzles of a difficulty in the shipped store, as tuples of rows
+    """
+    with store.PuzzleStore() as puzzles:
+        return {tuple(map(tuple, puzzles.get(difficulty, k).tolist())) for k in range(puzzles.count(difficulty))}
+
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    StandInServer over a store of PUZZLES, running on its own loop thread
+    """
+    path = str(tmp_path / 'test.store')
+    store.write_store(path, {difficulty: [parse_line(line)] for difficulty, line in PUZZLES.items()})
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    stand_in = remote.StandInServer(path=path)
+    asyncio.run_coroutine_threadsafe(stand_in.start(), loop).result(5)
+
+    def stop():
+        if stand_in.server.is_serving():
+            asyncio.run_coroutine_threadsafe(stand_in.close(), loop).result(5)
+
+    # The tests can stop it early
+    stand_in.stop = stop
+    try:
+        yield stand_in
+    finally:
+        stop()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+
+
+def test_fetcher_gets_boards_from_the_server(server):
+    fetcher = remote.BoardFetcher(server.url, prefetch=2, timeout=2.0)
+    try:
+        for difficulty, line in PUZZLES.items():
+            for _ in range(3):
+                board = fetcher.get_board(difficulty)
+                assert board == parse_line(line).tolist()
+                assert logic.solve(board)
+                assert all(value != 0 for row in board for value in row)
+    finally:
+        fetcher.close()
+
+
+def test_fetch_board_falls_back_to_the_store(server):
+    url = server.url
+    assert remote.fetch_board(url, 'medium', timeout=2.0) == parse_line(PUZZLES['medium']).tolist()
+
+    # Nothing listens on the port any more once the server is stopped
+    server.stop()
+
+    fetcher = remote.BoardFetcher(url, prefetch=2, timeout=1.0)
+    try:
+        board = fetcher.get_board('hard')
+    finally:
+        fetcher.close()
+    assert tuple(map(tuple, board)) in stored_boards('hard')
+
+    board = solver.get_board('easy', url)
+    assert tuple(map(tuple, board.tolist())) in stored_boards('easy')
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+"""
+NumPy batch solver: singles propagation for many boards at once
+"""
+
+"""
+Holds K boards as one (K, 9, 9) uint8 array and works on all of them together
+instead of calling valid_number square by square:
+
+1. The candidates of every square of every board come from one-hot (K, 9, 9, 9)
+    digit arrays reduced with any() over rows, columns and boxes.
+2. Naked singles (one candidate left) and hidden singles (a digit with one place
+    left in a row, column or box) are filled in for the whole batch in lockstep,
+    until no board changes anymore.
+3. Boards that logic alone can't finish (the stragglers) are handed to the normal
+    per-board solver in backends.py.
+
+Filled boards are checked before being trusted, so a board that breaks a rule is
+still reported as unsolved.
+
+All boards in one batch have to be the same size; 16x16 and 25x25 batches work
+the same way with (K, 16, 16, 16) and (K, 25, 25, 25) arrays.
+
+Needs numpy (pip install numpy), which the rest of the solver does not.
+"""
+
+from itertools import groupby
+
+import numpy as np
+
+import backends
+import instrument
+import parallel
+from board import Board, box_size
+
+SIZE = 9
+
+
+def digits_for(grids):
+    """
+    input: grids: (K, N, N) uint8 array
+    output: tuple (int box size, (N,) uint8 array of the digits 1-N)
+    """
+    size = grids.shape[-1]
+    return box_size(size), np.arange(1, size + 1, dtype=np.uint8)
+
+
+def to_array(boards):
+    """
+    input: boards: list of 2d lists of ints (or Boards) with 0 for the empty squares, all one size
+    output: (K, N, N) uint8 array (N = 9 for standard boards)
+    """
+    size = len(boards[0]) if boards else SIZE
+    if all(isinstance(board, Board) for board in boards):
+        # Straight from the bytes, no per-cell conversion
+        return np.frombuffer(b''.join(board.cells for board in boards), dtype=np.uint8).reshape(-1, size, size).copy()
+
+    return np.array([board.tolist() if isinstance(board, Board) else board for board in boards],
+                    dtype=np.uint8).reshape(-1, size, size)
+
+
+def candidates(grids):
+    """
+    Candidate digits of every square of every board
+    input: grids: (K, 9, 9) uint8 array
+    output: (K, 9, 9, 9) bool array, [k, i, j, d] is True if digit d + 1 can go in square
+        (i, j) of board k (always False for filled squares)
+    """
+    box, digits = digits_for(grids)
+    size = len(digits)
+    onehot = grids[..., None] == digits
+    k = len(grids)
+
+    rows = onehot.any(axis=2)
+    columns = onehot.any(axis=1)
+    boxes = onehot.reshape(k, box, box, box, box, size).any(axis=(2, 4))
+    boxes = boxes.repeat(box, axis=1).repeat(box, axis=2)
+
+    used = rows[:, :, None, :] | columns[:, None, :, :] | boxes
+    return ~used & (grids == 0)[..., None]
+
+
+def naked_singles(grids, allowed):
+    """
+    Fills every square that has exactly one candidate
+    output: bool array (K,) for the boards that changed
+    """
+    single = allowed.sum(axis=3) == 1
+    values = allowed.argmax(axis=3).astype(np.uint8) + 1
+    grids[single] = values[single]
+
+    return single.any(axis=(1, 2))
+
+
+def hidden_singles(grids, allowed):
+    """
+    Fills every square that is the only place left for a digit in one of its units
+    output: bool array (K,) for the boards that changed
+    """
+    k = len(grids)
+    box, digits = digits_for(grids)
+    size = len(digits)
+    in_row = allowed & (allowed.sum(axis=2) == 1)[:, :, None, :]
+    in_column = allowed & (allowed.sum(axis=1) == 1)[:, None, :, :]
+
+    box_counts = allowed.reshape(k, box, box, box, box, size).sum(axis=(2, 4))
+    box_counts = box_counts.repeat(box, axis=1).repeat(box, axis=2)
+    in_box = allowed & (box_counts == 1)
+
+    hidden = in_row | in_column | in_box
+    found = hidden.any(axis=3)
+    values = hidden.argmax(axis=3).astype(np.uint8) + 1
+    grids[found] = values[found]
+
+    return found.any(axis=(1, 2))
+
+
+def propagate(grids):
+    """
+    Applies naked and hidden singles to every board until none of them changes
+    input: grids: (K, 9, 9) uint8 array, filled in place
+    """
+    active = np.ones(len(grids), dtype=bool)
+    while active.any():
+        subset = grids[active]
+        changed = naked_singles(subset, candidates(subset))
+        changed |= hidden_singles(subset, candidates(subset))
+        grids[active] = subset
+
+        indexes = np.flatnonzero(active)
+        active[indexes[~changed]] = False
+
+
+def complete(grids):
+    """
+    output: bool array (K,) for the boards that are full and break no rule
+    """
+    box, digits = digits_for(grids)
+    size = len(digits)
+    onehot = grids[..., None] == digits
+    k = len(grids)
+
+    rows = onehot.sum(axis=2) == 1
+    columns = onehot.sum(axis=1) == 1
+    boxes = onehot.reshape(k, box, box, box, box, size).sum(axis=(2, 4)) == 1
+
+    return rows.all(axis=(1, 2)) & columns.all(axis=(1, 2)) & boxes.all(axis=(1, 2, 3))
+
+
+def solve_batch(boards, backend='backtrack', timeout=None, max_nodes=None):
+    """
+    Solves a list of boards in place, vectorized where logic is enough
+    input: boards: list of 2d lists of ints (or Boards) with 0 for the empty squares, all one size
+    input: backend: solver engine for the stragglers (see backends.py)
+    input: timeout, max_nodes: give up on a straggler after this many seconds / guesses of its
+        search, or None (see instrument.Stats). The singles never count as guesses.
+    output: list of bool for whether each board was solved
+    """
+    limited = timeout is not None or max_nodes is not None
+    if not boards:
+        return []
+
+    grids = to_array(boards)
+    propagate(grids)
+    done = complete(grids)
+
+    solved = []
+    for board, grid, finished in zip(boards, grids, done):
+        filled = grid.tolist()
+
+        # Straggler: singles are forced in every solution, so searching on from
+        # the partly filled grid finds the same answers as the original board
+        if not finished:
+            if limited:
+                finished = instrument.profile(filled, backend, timeout=timeout, max_nodes=max_nodes).solved
+            else:
+                finished = backends.solve(filled, backend)
+
+        if finished:
+            for i in range(len(filled)):
+                for j in range(len(filled)):
+                    board[i][j] = filled[i][j]
+        solved.append(bool(finished))
+
+    return solved
+
+
+def solve_stream(boards, chunksize=1024, backend='backtrack', timeout=None, max_nodes=None):
+    """
+    Streams boards through solve_batch a chunk at a time
+    input: boards: iterable of boards
+    input: chunksize: int number of boards per numpy batch
+    input: backend: solver engine for the stragglers (see backends.py)
+    input: timeout, max_nodes: per straggler limits, same as solve_batch
+    output: generator of (board, bool solved) tuples
+    """
+    for chunk in parallel.chunks(boards, chunksize):
+        # A batch has to be one board size
+        for _, group in groupby(chunk, key=len):
+            group = list(group)
+            yield from zip(group, solve_batch(group, backend, timeout, max_nodes))